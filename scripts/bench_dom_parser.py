@@ -0,0 +1,73 @@
+"""Micro-benchmark: appointment row parsing from saved appointments HTML.
+
+Extracts rows from an HTML fixture the way the scraper's single
+eval_on_selector_all call does, then times src.scraper.dom_parser against the
+per-element parsing loop the scraper used to run. The Playwright round trips
+the old loop also made (three per element) are not part of these numbers.
+
+Usage: python scripts/bench_dom_parser.py [--html FILE] [--count 2000]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.database.models import Appointment
+from src.scraper.dom_parser import extract_rows, parse_rows
+
+DEFAULT_HTML = Path(__file__).parent / 'fixtures' / 'fresha_appointments.html'
+
+def legacy_parse(rows: list) -> list:
+    appointments = []
+    for row in rows:
+        fresha_id = row['id'] or f'appt-{int(time.time() * 1000)}-{random.random()}'
+        text = row['text']
+        customer_name_match = re.search(r'([A-Z][a-z]+ [A-Z][a-z]+)', text)
+        email_match = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', text)
+        if not email_match:
+            continue
+        date_match = re.search(r'(\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2})', text)
+        appointments.append(Appointment(
+            fresha_id=fresha_id,
+            customer_name=customer_name_match.group(1) if customer_name_match else 'Unknown Customer',
+            customer_email=email_match.group(1),
+            appointment_date=date_match.group(1) if date_match else datetime.now().isoformat(),
+            service_type='Nail Service'
+        ))
+    return appointments
+
+def run(count: int, rows: list, parse) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        parse(rows)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--html', type=Path, default=DEFAULT_HTML)
+    parser.add_argument('--count', type=int, default=2000)
+    args = parser.parse_args()
+    
+    html = args.html.read_text()
+    start = time.perf_counter()
+    rows = extract_rows(html)
+    extract_time = time.perf_counter() - start
+    appointments = parse_rows(rows)
+    print(f'{args.html.name}: {len(rows)} rows, {len(appointments)} appointments, '
+          f'extracted in {extract_time * 1e3:.2f} ms')
+    
+    results = {
+        'legacy loop': run(args.count, rows, legacy_parse),
+        'dom_parser': run(args.count, rows, parse_rows),
+    }
+    per_row = args.count * max(len(rows), 1)
+    for name, elapsed in results.items():
+        print(f'{name:>12}: {elapsed / per_row * 1e6:7.2f} us/row  ({elapsed:.3f}s for {args.count} pages)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark: wall-clock time of a multi-location week at different concurrencies.
+
+Scrapes --days days from --from for each --location from FRESHA_BASE_URL
+(e.g. scripts/fresha_standin.py --latency 0.5) with AsyncFreshaScraper,
+once per --concurrency value, and prints the wall-clock time, appointments
+and failed location days of each run. Scraped appointments are not saved.
+
+--standin runs the whole async path (login, session reuse, paging, API
+capture) end to end against an in-process scripts/fresha_standin.py
+instead, starting on its first recorded day by default, and exits non-zero
+unless every run finds exactly the recorded appointments.
+
+Usage: python scripts/bench_parallel_scrape.py [--from 2024-01-15] [--days 7]
+                                              [--location A --location B]
+                                              [--concurrency 1 --concurrency 4]
+                                              [--standin [--latency 0.5] [--page-size 1]]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.config import config
+from src.scraper.async_scraper import scrape_parallel
+from src.scraper.fresha_api import parse_appointments_payload
+from src.scraper.paging import days as iter_days
+from fresha_standin import DEFAULT_PAYLOAD, make_handler
+
+def start_standin(latency: float, page_size: int) -> list:
+    """Serve the stand-in on a free port, point the scraper at it and return its appointments"""
+    payload = DEFAULT_PAYLOAD.read_bytes()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(payload, 3600, page_size, latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config.FRESHA_BASE_URL = f'http://127.0.0.1:{server.server_address[1]}'
+    # Never touch the real Fresha session
+    config.FRESHA_SESSION_PATH = Path(tempfile.mkdtemp()) / 'fresha_session.json'
+    config.FRESHA_EMAIL, config.FRESHA_PASSWORD = 'bench@example.com', 'bench'
+    return parse_appointments_payload(json.loads(payload))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--from', dest='start', type=date.fromisoformat, default=None)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--location', dest='locations', action='append', default=None,
+                        help='Repeatable (default: main, north, south)')
+    parser.add_argument('--concurrency', action='append', type=int, default=None,
+                        help='Repeatable (default: 1, 2, 4, 8)')
+    parser.add_argument('--interval', type=float, default=None, help='Seconds between requests to a host')
+    parser.add_argument('--standin', action='store_true', help='Scrape an in-process Fresha stand-in')
+    parser.add_argument('--latency', type=float, default=0, help='Stand-in API response delay in seconds')
+    parser.add_argument('--page-size', type=int, default=0, help='Stand-in appointments per API page (default: all)')
+    args = parser.parse_args()
+    
+    locations = args.locations or ['main', 'north', 'south']
+    expected = None
+    if args.standin:
+        recorded = start_standin(args.latency, args.page_size)
+        start = args.start or date.fromisoformat(min(appointment.appointment_date[:10] for appointment in recorded))
+        end = (start + timedelta(days=args.days - 1)).isoformat()
+        # The stand-in serves the same appointments for every location
+        scraped_days = set(iter_days(start.isoformat(), end))
+        expected = len(locations) * sum(appointment.appointment_date[:10] in scraped_days for appointment in recorded)
+    else:
+        start = args.start or date.today()
+        end = (start + timedelta(days=args.days - 1)).isoformat()
+    
+    print(f'{len(locations)} locations x {args.days} days from {start}')
+    mismatched = 0
+    for concurrency in args.concurrency or [1, 2, 4, 8]:
+        stats = scrape_parallel(start.isoformat(), end, locations, concurrency, args.interval, save=False)
+        print(f"{concurrency:3d} pages: {stats['seconds']:6.1f}s, {stats['appointments']} appointments, "
+              f"{stats['failed']} failed")
+        if expected is not None and (stats['appointments'] != expected or stats['failed']):
+            mismatched += 1
+    
+    if expected is not None:
+        print(f'Expected {expected} appointments per run: {"all runs matched" if not mismatched else f"{mismatched} runs did not"}')
+        sys.exit(1 if mismatched else 0)
+
+if __name__ == '__main__':
+    main()
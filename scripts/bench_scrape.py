@@ -0,0 +1,51 @@
+"""Benchmark: appointments page load with and without request blocking.
+
+Scrapes FRESHA_BASE_URL (e.g. scripts/fresha_standin.py) once with every
+request allowed and once with the configured FRESHA_BLOCKED_RESOURCE_TYPES
+and FRESHA_BLOCKED_HOSTS, each in a fresh browser, and prints page load
+time, requests, bytes transferred and JS heap for both. Scraped
+appointments are not saved.
+
+Usage: python scripts/bench_scrape.py [--runs 3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.scraper.fresha_scraper import FreshaScraper
+from src.scraper.request_policy import RequestPolicy
+
+def scrape_once(policy: RequestPolicy) -> dict:
+    scraper = FreshaScraper(request_policy=policy)
+    try:
+        scraper.initialize()
+        scraper.login()
+        start = time.perf_counter()
+        appointments = scraper.scrape_appointments()
+        metrics = scraper.page_metrics()
+        metrics['scrape_ms'] = (time.perf_counter() - start) * 1e3
+        metrics['appointments'] = len(appointments)
+        return metrics
+    finally:
+        scraper.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    
+    policies = {'load everything': RequestPolicy(), 'blocking': RequestPolicy.from_config()}
+    for name, policy in policies.items():
+        for run in range(args.runs):
+            metrics = scrape_once(policy)
+            heap = metrics['js_heap'] / 2**20 if metrics['js_heap'] is not None else float('nan')
+            print(f"{name:>16} #{run + 1}: scrape {metrics['scrape_ms']:6.0f} ms, "
+                  f"load {metrics['load_ms'] or 0:6.0f} ms, {metrics['requests']:3d} requests "
+                  f"({metrics['blocked']} blocked), {metrics['transferred'] / 1024:7.0f} KB, "
+                  f"JS heap {heap:5.1f} MB, {metrics['appointments']} appointments")
+
+if __name__ == '__main__':
+    main()
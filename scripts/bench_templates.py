@@ -0,0 +1,55 @@
+"""Micro-benchmark: template render + MIME serialization per message.
+
+Compares the compiled templates and prebuilt MIME headers with building a
+fresh MIMEMultipart tree per recipient, as the email service used to.
+
+Usage: python scripts/bench_templates.py [--count 5000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from src.email.email_service import build_message
+from src.email.templates import get_thank_you_email
+
+FROM_HEADER = 'Nail Salon <salon@example.com>'
+
+def mime_tree(customer_email: str, template: dict) -> bytes:
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = template['subject']
+    msg['From'] = FROM_HEADER
+    msg['To'] = customer_email
+    msg.attach(MIMEText(template['text'], 'plain'))
+    msg.attach(MIMEText(template['html'], 'html'))
+    return msg.as_bytes()
+
+def run(count: int, serialize) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        template = get_thank_you_email(f'Customer {i}', 'Gel Manicure')
+        serialize(f'customer{i}@example.com', template)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=5000)
+    args = parser.parse_args()
+    
+    # Warm up compilation and caches
+    run(10, lambda to, template: build_message(FROM_HEADER, to, template))
+    
+    baseline = run(args.count, mime_tree)
+    compiled = run(args.count, lambda to, template: build_message(FROM_HEADER, to, template))
+    
+    print(f'{args.count} messages')
+    print(f'  MIMEMultipart per message: {baseline:.3f}s ({baseline / args.count * 1e6:.1f} us/msg)')
+    print(f'  compiled + prebuilt MIME:  {compiled:.3f}s ({compiled / args.count * 1e6:.1f} us/msg)')
+    print(f'  speedup: {baseline / compiled:.1f}x')
+
+if __name__ == '__main__':
+    main()
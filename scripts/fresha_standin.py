@@ -0,0 +1,151 @@
+"""Local stand-in for the Fresha web app, serving recorded appointment JSON.
+
+Serves a login form that redirects to /dashboard, and an /appointments page
+(?date=YYYY-MM-DD for one day) that fetches /api/v2/appointments like the
+real app, --page-size appointments at a time as the list is scrolled, and
+renders them as HTML rows for the DOM fallback. Logging in sets a session cookie
+that expires after --session-ttl seconds; without it every other page
+redirects to /login. Point the scraper at it with FRESHA_BASE_URL:
+
+    python scripts/fresha_standin.py --port 8765
+    FRESHA_BASE_URL=http://127.0.0.1:8765 python -m src.cli scrape
+
+--latency delays every API response, to stand in for Fresha's response times
+when timing concurrent scrapes. --parse-only skips the server and prints what the parser makes of the payload.
+
+Usage: python scripts/fresha_standin.py [--port 8765] [--payload FILE] [--session-ttl 3600]
+                                      [--page-size N] [--latency SECONDS] [--parse-only]
+"""
+import argparse
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.scraper.fresha_api import parse_appointments_payload
+
+DEFAULT_PAYLOAD = Path(__file__).parent / 'fixtures' / 'fresha_appointments.json'
+
+LOGIN_PAGE = '''<!doctype html>
+<form action="/dashboard" method="get">
+  <input type="email" name="email"> <input type="password" name="password">
+  <button type="submit">Log in</button>
+</form>'''
+
+# Loads appointments a page at a time as the list is scrolled, like the real
+# calendar, and renders each one as a row for the DOM fallback
+APPOINTMENTS_PAGE = '''<!doctype html>
+<style>.appointment-item { height: 300px; }</style>
+<div id="calendar"></div>
+<script>
+let page = 1, loading = false, done = false;
+const day = new URLSearchParams(location.search).get('date') || '';
+async function more() {
+  if (loading || done) return;
+  loading = true;
+  const body = await (await fetch(`/api/v2/appointments?page=${page}&date=${day}`)).json();
+  for (const appointment of body.data.appointments) {
+    const client = appointment.client || {};
+    const row = document.createElement('div');
+    row.className = 'appointment-item';
+    row.dataset.appointmentId = appointment.id;
+    row.innerText = [client.firstName, client.lastName, client.email, (appointment.startTime || '').slice(0, 10)].join(' ');
+    document.getElementById('calendar').appendChild(row);
+  }
+  done = !body.meta.nextPage;
+  page += 1;
+  loading = false;
+}
+window.addEventListener('scroll', () => {
+  if (innerHeight + scrollY >= document.body.scrollHeight - 50) more();
+});
+more();
+</script>'''
+
+def _records(payload) -> list:
+    """The list of appointment records in a recorded payload"""
+    while isinstance(payload, dict):
+        payload = next((value for value in payload.values() if isinstance(value, (list, dict))), [])
+    return payload
+
+def api_page(records: list, query: dict, page_size: int) -> bytes:
+    """One page of records, for ?date=YYYY-MM-DD (all days if empty) and ?page=N"""
+    day = query.get('date', [''])[0]
+    if day:
+        records = [record for record in records if str(record.get('startTime', '')).startswith(day)]
+    page = max(int(query.get('page', ['1'])[0]), 1)
+    size = page_size or max(len(records), 1)
+    chunk = records[(page - 1) * size:page * size]
+    next_page = page + 1 if page * size < len(records) else None
+    return json.dumps({'data': {'appointments': chunk}, 'meta': {'page': page, 'nextPage': next_page}}).encode()
+
+def make_handler(payload: bytes, session_ttl: int, page_size: int = 0, latency: float = 0):
+    records = _records(json.loads(payload))
+    pages = {
+        '/login': ('text/html', LOGIN_PAGE.encode()),
+        '/dashboard': ('text/html', b'<!doctype html><h1>Dashboard</h1>'),
+        '/appointments': ('text/html', APPOINTMENTS_PAGE.encode()),
+        '/api/v2/appointments': ('application/json', None),
+    }
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path, _, query = self.path.partition('?')
+            if path not in pages:
+                self.send_error(404)
+                return
+            # The login form submits to /dashboard
+            logging_in = path == '/dashboard' and 'email=' in query
+            logged_in = 'standin_session=' in (self.headers.get('Cookie') or '')
+            if path != '/login' and not (logged_in or logging_in):
+                self.send_response(302)
+                self.send_header('Location', '/login')
+                self.end_headers()
+                return
+            content_type, body = pages[path]
+            if body is None:
+                time.sleep(latency)
+                body = api_page(records, parse_qs(query), page_size)
+            self.send_response(200)
+            if logging_in:
+                self.send_header('Set-Cookie', f'standin_session=1; Max-Age={session_ttl}; Path=/')
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            sys.stderr.write(f'{self.command} {self.path} -> {args[1]}\n')
+    
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--payload', type=Path, default=DEFAULT_PAYLOAD)
+    parser.add_argument('--session-ttl', type=int, default=3600)
+    parser.add_argument('--page-size', type=int, default=0, help='Appointments per API page (default: all)')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds to delay each API response')
+    parser.add_argument('--parse-only', action='store_true')
+    args = parser.parse_args()
+    
+    payload = args.payload.read_bytes()
+    if args.parse_only:
+        for appointment in parse_appointments_payload(json.loads(payload)):
+            print(f'{appointment.fresha_id}\t{appointment.appointment_date}\t'
+                  f'{appointment.customer_name} <{appointment.customer_email}>\t{appointment.service_type}')
+        return
+    
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(payload, args.session_ttl, args.page_size, args.latency))
+    print(f'Serving {args.payload} at http://127.0.0.1:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
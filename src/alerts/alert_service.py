@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 from src.email.email_service import EmailService
 from src.utils.logger import logger
+from src.utils.circuit_breaker import CircuitBreaker, on_circuit_open
 
 class AlertService:
     def __init__(self):
@@ -47,3 +48,22 @@ Context:
     def send_critical_alert(self, subject: str, message: str):
         self.email_service.send_alert_email(subject, message)
         logger.info(f'Critical alert sent: {subject}')
+    
+    def handle_circuit_open(self, breaker: CircuitBreaker, error: Exception):
+        """Alert once when a dependency's circuit trips; calls then fail fast until it recovers"""
+        message = f"""
+{breaker.name} is failing and its circuit breaker has opened.
+
+Error: {str(error)}
+Type: {type(error).__name__}
+
+Consecutive Failures: {breaker.failures}
+Time: {datetime.now().isoformat()}
+
+Calls fail fast and pending emails stay queued. A trial call is made every
+{breaker.reset_timeout:.0f} seconds until one succeeds.
+        """.strip()
+        
+        self.send_critical_alert(f'{breaker.name} Unavailable - Circuit Open', message)
+
+on_circuit_open(lambda breaker, error: AlertService().handle_circuit_open(breaker, error))
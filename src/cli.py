@@ -2,9 +2,11 @@ import click
 from src.database.db import init_database
 from src.utils.health_check import HealthCheck
 from src.utils.db_backup import backup_database, restore_database
+from src.utils.config import config
 from src.utils.logger import logger
 from src.scheduler.script1_thankyou import send_thank_you_emails
 from src.scheduler.script2_followup import send_followup_emails
+from src.scheduler.script3_outbox import deliver_outbox, deliver_outbox_sharded
 from src.scraper.fresha_scraper import FreshaScraper
 from pathlib import Path
 import json
@@ -92,27 +94,140 @@ def send_followup():
         raise click.Abort()
 
 @cli.command()
-def scrape():
+def send_outbox():
+    """Send queued emails that are due, including retries"""
+    click.echo('Sending due outbox emails...')
+    try:
+        deliver_outbox()
+        click.echo('✓ Outbox processed')
+    except Exception as e:
+        click.echo(f'✗ Failed to send outbox emails: {e}', err=True)
+        raise click.Abort()
+
+def _parse_shard(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise click.BadParameter('expected INDEX/COUNT, e.g. 0/4')
+    if count < 1 or not 0 <= index < count:
+        raise click.BadParameter('INDEX must be between 0 and COUNT - 1')
+    return index, count
+
+@cli.command()
+@click.option('--shard', callback=_parse_shard, metavar='INDEX/COUNT',
+              help='Run only this shard in the current process (e.g. 0/4)')
+@click.option('--processes', type=click.IntRange(min=1), default=config.EMAIL_SEND_PROCESSES,
+              show_default=True, help='Sender processes to start when --shard is not given')
+@click.option('--email-type', type=click.Choice(['thank_you', 'thank_you_12pm', 'thank_you_7pm', 'followup_7day']),
+              help='Only send this email type')
+def send_worker(shard, processes, email_type):
+    """Send outbox emails with hash-sharded sender processes"""
+    try:
+        if shard:
+            click.echo(f'Sending outbox emails for shard {shard[0]}/{shard[1]}...')
+            counts = deliver_outbox(shard, email_type)
+        else:
+            click.echo(f'Sending outbox emails with {processes} processes...')
+            counts = deliver_outbox_sharded(processes, email_type)
+        click.echo(f'✓ {counts["sent"]} sent, {counts["skipped"]} skipped, {counts["failed"]} failed')
+    except Exception as e:
+        click.echo(f'✗ Send worker failed: {e}', err=True)
+        raise click.Abort()
+
+@cli.command()
+@click.option('--from', 'start', type=click.DateTime(['%Y-%m-%d']),
+              help='First day to scrape (default: the default appointments page)')
+@click.option('--to', 'end', type=click.DateTime(['%Y-%m-%d']), help='Last day to scrape (default: --from)')
+def scrape(start, end):
     """Scrape appointments from Fresha"""
-    click.echo('Scraping appointments from Fresha...')
+    if end and not start:
+        raise click.BadParameter('--to needs --from')
+    if start and end and end < start:
+        raise click.BadParameter('--to is before --from')
+    start = start.date().isoformat() if start else None
+    end = end.date().isoformat() if end else start
+    click.echo(f'Scraping appointments from Fresha{f" for {start} to {end}" if start else ""}...')
     scraper = FreshaScraper()
     try:
         scraper.initialize()
         scraper.login()
-        appointments = scraper.scrape_appointments()
-        scraper.save_appointments(appointments)
-        click.echo(f'✓ Scraped {len(appointments)} appointments')
+        saved = scraper.scrape_and_save(start, end)
+        click.echo(f'✓ Scraped {saved} appointments')
     except Exception as e:
         click.echo(f'✗ Scraping failed: {e}', err=True)
         raise click.Abort()
     finally:
         scraper.close()
 
+@cli.command()
+@click.option('--from', 'start', type=click.DateTime(['%Y-%m-%d']), required=True, help='First day to scrape')
+@click.option('--to', 'end', type=click.DateTime(['%Y-%m-%d']), help='Last day to scrape (default: --from)')
+@click.option('--location', 'locations', multiple=True,
+              help='Location to scrape, repeatable (default: FRESHA_LOCATIONS, else FRESHA_DAY_URL)')
+@click.option('--concurrency', type=click.IntRange(min=1), default=config.FRESHA_SCRAPE_CONCURRENCY,
+              show_default=True, help='Pages to read at once')
+def scrape_parallel(start, end, locations, concurrency):
+    """Scrape several days and locations from Fresha at once"""
+    from src.scraper.async_scraper import scrape_parallel as run_scrape
+    
+    if end and end < start:
+        raise click.BadParameter('--to is before --from')
+    start = start.date().isoformat()
+    end = end.date().isoformat() if end else start
+    click.echo(f'Scraping appointments from Fresha for {start} to {end} with {concurrency} pages...')
+    try:
+        stats = run_scrape(start, end, list(locations), concurrency)
+    except Exception as e:
+        click.echo(f'✗ Scraping failed: {e}', err=True)
+        raise click.Abort()
+    click.echo(f"✓ Scraped {stats['appointments']} appointments from {stats['locations']} locations "
+               f"x {stats['days']} days in {stats['seconds']:.1f}s")
+    if stats['failed']:
+        click.echo(f"✗ {stats['failed']} of {stats['windows']} location days failed, see the log", err=True)
+        raise click.Abort()
+
+@cli.command()
+@click.option('--port', type=int, default=config.FRESHA_BROWSER_PORT, show_default=True,
+              help='Local port for scrapers to connect to (FRESHA_BROWSER_URL=http://127.0.0.1:PORT)')
+@click.option('--memory-limit', type=click.IntRange(min=64), default=config.FRESHA_BROWSER_MEMORY_LIMIT_MB,
+              show_default=True, help='Restart Chromium once it uses more than this many MB')
+def browser_daemon(port, memory_limit):
+    """Keep a warm Chromium running for scrapes to reuse"""
+    from src.scraper.browser_daemon import BrowserDaemon
+    
+    click.echo(f'Starting browser daemon on port {port}...')
+    try:
+        BrowserDaemon(port, memory_limit).run()
+    except Exception as e:
+        click.echo(f'✗ Browser daemon failed: {e}', err=True)
+        raise click.Abort()
+
+@cli.command()
+def check_indexes():
+    """Verify hot queries are served by indexes (EXPLAIN QUERY PLAN)"""
+    from src.database.query_plans import HOT_QUERIES, find_full_scans
+    
+    init_database()
+    offenders = find_full_scans()
+    
+    for name in HOT_QUERIES:
+        if name in offenders:
+            click.echo(f'✗ {name}: ' + '; '.join(offenders[name]), err=True)
+        else:
+            click.echo(f'✓ {name}')
+    
+    if offenders:
+        click.echo(f'\n✗ {len(offenders)} queries still scan a full table', err=True)
+        raise click.Abort()
+    click.echo('\n✓ All hot queries use indexes')
+
 @cli.command()
 def stats():
     """Show statistics"""
     from src.database.models import get_appointments_by_date
-    from datetime import datetime
+    from src.utils.dates import local_date
     from src.database.db import get_connection
     from src.database.response_tracking import ResponseTracker
     from src.database.segmentation import CustomerSegmentation
@@ -125,7 +240,7 @@ def stats():
     total_appointments = cursor.fetchone()[0]
     
     # Today's appointments
-    today = datetime.now().strftime('%Y-%m-%d')
+    today = local_date()
     today_appointments = len(get_appointments_by_date(today))
     
     # Email stats
@@ -145,8 +260,6 @@ def stats():
     # Segmentation
     segment_stats = CustomerSegmentation.get_segment_stats()
     
-    conn.close()
-    
     click.echo('\n=== Statistics ===')
     click.echo(f'Total Appointments: {total_appointments}')
     click.echo(f"Today's Appointments: {today_appointments}")
@@ -1,15 +1,246 @@
 import sqlite3
 import logging
+import threading
+import weakref
 from pathlib import Path
 from src.utils.config import config
+from src.utils.dates import has_start_time, to_epoch
 
 logger = logging.getLogger('fresha_automation')
 
 db_dir = config.DB_PATH.parent
 db_dir.mkdir(exist_ok=True)
 
-def get_connection():
-    return sqlite3.connect(str(config.DB_PATH))
+class _ThreadConnection:
+    """A thread's connection; when the thread exits its thread-local copy is dropped and the connection closed"""
+    
+    def __init__(self, conn: sqlite3.Connection, db_path: str, close):
+        self.conn = conn
+        self.db_path = db_path
+        self.close = weakref.finalize(self, close, conn)
+
+class ConnectionManager:
+    """Hands out one persistent, tuned SQLite connection per thread.
+    
+    Connections are opened in WAL mode so readers (dashboard, health checks)
+    never block the scheduler's writes and vice versa. A connection is closed
+    when its thread exits, so short-lived worker threads do not leak them.
+    """
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+    
+    def _open(self, db_path: str) -> sqlite3.Connection:
+        busy_timeout = config.SQLITE_BUSY_TIMEOUT_MS
+        conn = sqlite3.connect(db_path, timeout=busy_timeout / 1000, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={busy_timeout}')
+        conn.execute(f'PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+    
+    def get(self) -> sqlite3.Connection:
+        db_path = str(config.DB_PATH)
+        held = getattr(self._local, 'held', None)
+        if held is not None and held.db_path != db_path:
+            held.close()
+            held = None
+        if held is None:
+            held = _ThreadConnection(self._open(db_path), db_path, self._discard)
+            self._local.held = held
+        return held.conn
+    
+    def _discard(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._connections.discard(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    
+    def close(self):
+        """Close the calling thread's connection"""
+        held = getattr(self._local, 'held', None)
+        if held is not None:
+            self._local.held = None
+            held.close()
+    
+    def close_all(self):
+        """Close every connection handed out, e.g. before replacing the database file"""
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            self._discard(conn)
+        self._local = threading.local()
+
+connection_manager = ConnectionManager()
+
+def get_connection() -> sqlite3.Connection:
+    """Return the calling thread's persistent connection. Callers must not close it."""
+    return connection_manager.get()
+
+def close_connections():
+    connection_manager.close_all()
+
+def _add_hot_query_indexes(cursor: sqlite3.Cursor):
+    # MetricsCollector.get_email_stats: sent_at range, GROUP BY status, email_type
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_email_logs_sent_at_status_type
+        ON email_logs (sent_at, status, email_type)
+    ''')
+    # HealthCheck.check_recent_errors and status counts
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_email_logs_status_sent_at_type
+        ON email_logs (status, sent_at, email_type)
+    ''')
+    
+    # Fold duplicate response rows into one per (appointment_id, email_type)
+    # so the unique index behind ResponseTracker's ON CONFLICT can be built
+    cursor.execute('''
+        UPDATE customer_responses
+        SET opened = (SELECT MAX(r.opened) FROM customer_responses r
+                      WHERE r.appointment_id IS customer_responses.appointment_id
+                      AND r.email_type = customer_responses.email_type),
+            clicked = (SELECT MAX(r.clicked) FROM customer_responses r
+                       WHERE r.appointment_id IS customer_responses.appointment_id
+                       AND r.email_type = customer_responses.email_type),
+            replied = (SELECT MAX(r.replied) FROM customer_responses r
+                       WHERE r.appointment_id IS customer_responses.appointment_id
+                       AND r.email_type = customer_responses.email_type),
+            feedback = COALESCE(feedback, (SELECT MAX(r.feedback) FROM customer_responses r
+                                           WHERE r.appointment_id IS customer_responses.appointment_id
+                                           AND r.email_type = customer_responses.email_type))
+        WHERE id IN (SELECT MAX(id) FROM customer_responses
+                     GROUP BY appointment_id, email_type HAVING COUNT(*) > 1)
+    ''')
+    cursor.execute('''
+        DELETE FROM customer_responses
+        WHERE id NOT IN (SELECT MAX(id) FROM customer_responses GROUP BY appointment_id, email_type)
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_customer_responses_appointment_type
+        ON customer_responses (appointment_id, email_type)
+    ''')
+    # ResponseTracker.get_customer_engagement
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_customer_responses_email
+        ON customer_responses (customer_email)
+    ''')
+    # Give the planner row estimates so it picks the new indexes
+    cursor.execute('ANALYZE')
+
+def _add_appointment_timestamps(cursor: sqlite3.Cursor):
+    # appointment_date holds a mix of M/D/YYYY, YYYY-MM-DD and ISO strings that
+    # DATE() cannot index (and returns NULL for); appointment_at is the same
+    # moment as UTC epoch seconds so date filters become indexed range scans
+    cursor.execute('ALTER TABLE appointments ADD COLUMN appointment_at INTEGER')
+    cursor.execute('SELECT id, appointment_date FROM appointments')
+    backfill = [(to_epoch(appointment_date), id) for id, appointment_date in cursor.fetchall()]
+    cursor.executemany('UPDATE appointments SET appointment_at = ? WHERE id = ?', backfill)
+    unparsed = sum(1 for appointment_at, _ in backfill if appointment_at is None)
+    if unparsed:
+        logger.warning(f'{unparsed} appointments have an unrecognised appointment_date')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_appointments_appointment_at
+        ON appointments (appointment_at)
+    ''')
+
+def _add_email_outbox(cursor: sqlite3.Cursor):
+    # One row per (appointment, email type) ever enqueued. Workers claim rows
+    # by setting lease_owner/lease_expires_at; a row whose lease has expired
+    # is claimable again, so a crashed worker's messages are not lost. Failed
+    # sends wait here for their next_attempt_at, so it is also the retry queue.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            appointment_id INTEGER NOT NULL,
+            email_type TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            message BLOB,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at INTEGER NOT NULL,
+            lease_owner TEXT,
+            lease_expires_at INTEGER,
+            last_error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            sent_at DATETIME,
+            UNIQUE (appointment_id, email_type),
+            FOREIGN KEY (appointment_id) REFERENCES appointments(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+        ON email_outbox (status, next_attempt_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_lease
+        ON email_outbox (status, lease_expires_at)
+    ''')
+
+def _add_single_thank_you_flag(cursor: sqlite3.Cursor):
+    # Event-driven thank-you emails go out once per appointment, after the visit
+    cursor.execute('ALTER TABLE email_tracking ADD COLUMN thank_you_sent BOOLEAN DEFAULT 0')
+
+def _add_job_locks(cursor: sqlite3.Cursor):
+    # One row per scheduled job: who holds it now and the last window it ran for
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_locks (
+            job_id TEXT PRIMARY KEY,
+            lock_owner TEXT,
+            lock_expires_at INTEGER,
+            last_run_at INTEGER
+        )
+    ''')
+
+def _add_appointment_change_times(cursor: sqlite3.Cursor):
+    # Set when a saved appointment's details change, so the thank-you dispatcher
+    # can pick up reschedules without rescanning every appointment
+    cursor.execute('ALTER TABLE appointments ADD COLUMN updated_at INTEGER')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_appointments_updated_at
+        ON appointments (updated_at)
+    ''')
+
+def _add_appointment_start_known(cursor: sqlite3.Cursor):
+    # Page-text rows and older rows often give only the day; appointment_at is
+    # then local midnight, which is not when the visit happened
+    cursor.execute('ALTER TABLE appointments ADD COLUMN has_start_time INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('SELECT id, appointment_date FROM appointments')
+    backfill = [(id,) for id, appointment_date in cursor.fetchall() if has_start_time(appointment_date)]
+    cursor.executemany('UPDATE appointments SET has_start_time = 1 WHERE id = ?', backfill)
+
+# Schema steps applied in order; the last applied version is kept in PRAGMA user_version
+MIGRATIONS = [
+    (1, _add_hot_query_indexes),
+    (2, _add_appointment_timestamps),
+    (3, _add_email_outbox),
+    (4, _add_single_thank_you_flag),
+    (5, _add_job_locks),
+    (6, _add_appointment_change_times),
+    (7, _add_appointment_start_known),
+]
+
+def migrate(conn: sqlite3.Connection):
+    """Apply pending schema migrations, each in its own transaction"""
+    for version, migration in MIGRATIONS:
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+            continue
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Another process may have applied it while we waited for the lock
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+                continue
+            migration(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {version}')
+        logger.info(f'Applied schema migration {version}: {migration.__name__}')
 
 def init_database():
     conn = get_connection()
@@ -51,10 +282,23 @@ def init_database():
         )
     ''')
     
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_name TEXT NOT NULL,
+            started_at DATETIME NOT NULL,
+            finished_at DATETIME,
+            status TEXT NOT NULL,
+            sent INTEGER DEFAULT 0,
+            skipped INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0
+        )
+    ''')
+    
     # Initialize response tracking
     from src.database.response_tracking import ResponseTracker
     ResponseTracker.init_response_tracking()
     
     conn.commit()
-    conn.close()
+    migrate(conn)
     logger.info('Database initialized')
@@ -0,0 +1,40 @@
+import time
+from typing import Optional
+from src.database.db import get_connection
+
+def acquire_job_lock(job_id: str, owner: str, ttl: int) -> bool:
+    """Take the lock on a scheduled job for ttl seconds.
+    
+    Returns False while another scheduler process holds an unexpired lock.
+    A holder that died without releasing the lock loses it once ttl passes.
+    """
+    now = int(time.time())
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO job_locks (job_id, lock_owner, lock_expires_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE
+            SET lock_owner = excluded.lock_owner, lock_expires_at = excluded.lock_expires_at
+            WHERE job_locks.lock_owner IS NULL OR job_locks.lock_expires_at <= ?
+        ''', (job_id, owner, now + ttl, now))
+        return cursor.rowcount == 1
+
+def release_job_lock(job_id: str, owner: str, ran_for: Optional[float] = None):
+    """Release a job lock, recording ran_for (epoch seconds) as its last run"""
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            UPDATE job_locks
+            SET lock_owner = NULL, lock_expires_at = NULL,
+                last_run_at = MAX(COALESCE(last_run_at, 0), COALESCE(?, 0))
+            WHERE job_id = ? AND lock_owner = ?
+        ''', (int(ran_for) if ran_for is not None else None, job_id, owner))
+
+def get_last_run(job_id: str) -> Optional[int]:
+    """Epoch seconds of the latest window the job ran for, or None if it never has"""
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT last_run_at FROM job_locks WHERE job_id = ?', (job_id,))
+    row = cursor.fetchone()
+    return row[0] if row and row[0] else None
@@ -1,6 +1,11 @@
-from typing import Optional, List
-from datetime import datetime
+import atexit
+import threading
+import time
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime, timezone
 from src.database.db import get_connection
+from src.utils.config import config
+from src.utils.dates import has_start_time, to_epoch, day_bounds, local_date
 import logging
 
 logger = logging.getLogger('fresha_automation')
@@ -16,101 +21,191 @@ class Appointment:
         self.appointment_date = appointment_date
         self.service_type = service_type
 
-def save_appointment(appointment: Appointment) -> int:
+def _appointment_from_row(row) -> Appointment:
+    return Appointment(
+        id=row[0],
+        fresha_id=row[1],
+        customer_name=row[2],
+        customer_email=row[3],
+        appointment_date=row[4],
+        service_type=row[5]
+    )
+
+# Keep IN (...) lists under SQLite's default host-parameter limit
+_ID_LOOKUP_CHUNK = 500
+
+def save_appointments(appointments: List[Appointment]) -> Dict[str, int]:
+    """Upsert appointments in one transaction and return a fresha_id -> id map.
+    
+    Existing rows keep their id, and rows whose values did not change are not
+    rewritten at all.
+    """
+    if not appointments:
+        return {}
+    
     conn = get_connection()
-    cursor = conn.cursor()
+    with conn:
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO appointments 
+            (fresha_id, customer_name, customer_email, appointment_date, appointment_at, has_start_time, service_type)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(fresha_id) DO UPDATE SET
+                customer_name = excluded.customer_name,
+                customer_email = excluded.customer_email,
+                appointment_date = excluded.appointment_date,
+                appointment_at = excluded.appointment_at,
+                has_start_time = excluded.has_start_time,
+                service_type = excluded.service_type,
+                updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE customer_name IS NOT excluded.customer_name
+            OR customer_email IS NOT excluded.customer_email
+            OR appointment_date IS NOT excluded.appointment_date
+            OR service_type IS NOT excluded.service_type
+        ''', [
+            (
+                appointment.fresha_id,
+                appointment.customer_name,
+                appointment.customer_email,
+                appointment.appointment_date,
+                to_epoch(appointment.appointment_date),
+                int(has_start_time(appointment.appointment_date)),
+                appointment.service_type
+            )
+            for appointment in appointments
+        ])
+        
+        fresha_ids = list({appointment.fresha_id for appointment in appointments})
+        ids = {}
+        for start in range(0, len(fresha_ids), _ID_LOOKUP_CHUNK):
+            chunk = fresha_ids[start:start + _ID_LOOKUP_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(
+                f'SELECT fresha_id, id FROM appointments WHERE fresha_id IN ({placeholders})',
+                chunk
+            )
+            ids.update(cursor.fetchall())
     
-    cursor.execute('''
-        INSERT OR REPLACE INTO appointments 
-        (fresha_id, customer_name, customer_email, appointment_date, service_type)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (
-        appointment.fresha_id,
-        appointment.customer_name,
-        appointment.customer_email,
-        appointment.appointment_date,
-        appointment.service_type
-    ))
-    
-    cursor.execute('SELECT id FROM appointments WHERE fresha_id = ?', (appointment.fresha_id,))
-    result = cursor.fetchone()
-    appointment_id = result[0] if result else cursor.lastrowid
-    
-    conn.commit()
-    conn.close()
-    return appointment_id
+    for appointment in appointments:
+        appointment.id = ids.get(appointment.fresha_id)
+    return ids
+
+def save_appointment(appointment: Appointment) -> int:
+    return save_appointments([appointment])[appointment.fresha_id]
 
 def get_appointments_by_date(date: str) -> List[Appointment]:
     conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
-        SELECT * FROM appointments WHERE DATE(appointment_date) = DATE(?)
-    ''', (date,))
+        SELECT * FROM appointments WHERE appointment_at >= ? AND appointment_at < ?
+    ''', day_bounds(date))
     
     rows = cursor.fetchall()
-    conn.close()
     
-    appointments = []
-    for row in rows:
-        appointments.append(Appointment(
-            id=row[0],
-            fresha_id=row[1],
-            customer_name=row[2],
-            customer_email=row[3],
-            appointment_date=row[4],
-            service_type=row[5]
-        ))
-    return appointments
+    return [_appointment_from_row(row) for row in rows]
 
 def get_appointments_7_days_ago() -> List[Appointment]:
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM appointments WHERE DATE(appointment_date) = DATE('now', '-7 days')
-    ''')
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    appointments = []
-    for row in rows:
-        appointments.append(Appointment(
-            id=row[0],
-            fresha_id=row[1],
-            customer_name=row[2],
-            customer_email=row[3],
-            appointment_date=row[4],
-            service_type=row[5]
-        ))
-    return appointments
+    return get_appointments_by_date(local_date(days_ago=7))
 
 def log_email(appointment_id: Optional[int], email_type: str, 
               status: str, error_message: Optional[str] = None) -> int:
     conn = get_connection()
-    cursor = conn.cursor()
+    with conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO email_logs (appointment_id, email_type, status, error_message)
+            VALUES (?, ?, ?, ?)
+        ''', (appointment_id, email_type, status, error_message))
+        
+        log_id = cursor.lastrowid
+    return log_id
+
+class EmailLogWriter:
+    """Buffers email_logs rows and writes them in batched transactions.
     
-    cursor.execute('''
-        INSERT INTO email_logs (appointment_id, email_type, status, error_message)
-        VALUES (?, ?, ?, ?)
-    ''', (appointment_id, email_type, status, error_message))
+    Rows are flushed when the buffer reaches max_size, when flush() is called
+    at job end, every flush_interval seconds by a background thread started
+    with the first write, and at interpreter exit.
+    """
     
-    log_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return log_id
+    def __init__(self, max_size: int = 50, flush_interval: float = 5.0):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._timer = None
+        self._stopped = threading.Event()
+        atexit.register(self.close)
+    
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as error:
+                # The rows stay buffered for the next attempt
+                logger.error(f'Failed to flush email logs: {error}')
+    
+    def write(self, appointment_id: Optional[int], email_type: str,
+              status: str, error_message: Optional[str] = None):
+        # Stamp rows when they are written, not when the batch is flushed
+        sent_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._buffer.append((appointment_id, email_type, sent_at, status, error_message))
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._flush_periodically, name='email-log-flush', daemon=True)
+                self._timer.start()
+            due = (len(self._buffer) >= self.max_size or
+                   time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+    
+    def flush(self) -> int:
+        """Write all buffered rows in one transaction and return how many were written"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not rows:
+            return 0
+        
+        try:
+            conn = get_connection()
+            with conn:
+                conn.executemany('''
+                    INSERT INTO email_logs (appointment_id, email_type, sent_at, status, error_message)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', rows)
+        except Exception:
+            with self._lock:
+                self._buffer[:0] = rows
+            raise
+        return len(rows)
+    
+    def close(self):
+        """Stop the background flushes and write what is left"""
+        self._stopped.set()
+        self.flush()
+
+email_log_writer = EmailLogWriter(
+    max_size=config.EMAIL_LOG_BUFFER_SIZE,
+    flush_interval=config.EMAIL_LOG_FLUSH_INTERVAL
+)
 
 class EmailTracking:
     def __init__(self, appointment_id: int, thank_you_sent_12pm: bool = False,
                  thank_you_sent_7pm: bool = False, followup_sent: bool = False,
-                 followup_sent_date: Optional[str] = None, id: Optional[int] = None):
+                 followup_sent_date: Optional[str] = None, thank_you_sent: bool = False,
+                 id: Optional[int] = None):
         self.id = id
         self.appointment_id = appointment_id
         self.thank_you_sent_12pm = thank_you_sent_12pm
         self.thank_you_sent_7pm = thank_you_sent_7pm
         self.followup_sent = followup_sent
         self.followup_sent_date = followup_sent_date
+        self.thank_you_sent = thank_you_sent
 
 def get_email_tracking(appointment_id: int) -> Optional[EmailTracking]:
     conn = get_connection()
@@ -118,7 +213,6 @@ def get_email_tracking(appointment_id: int) -> Optional[EmailTracking]:
     
     cursor.execute('SELECT * FROM email_tracking WHERE appointment_id = ?', (appointment_id,))
     row = cursor.fetchone()
-    conn.close()
     
     if not row:
         return None
@@ -129,42 +223,243 @@ def get_email_tracking(appointment_id: int) -> Optional[EmailTracking]:
         thank_you_sent_12pm=bool(row[2]),
         thank_you_sent_7pm=bool(row[3]),
         followup_sent=bool(row[4]),
-        followup_sent_date=row[5]
+        followup_sent_date=row[5],
+        thank_you_sent=bool(row[6])
     )
 
 def update_email_tracking(tracking: EmailTracking):
     conn = get_connection()
-    cursor = conn.cursor()
-    
-    existing = get_email_tracking(tracking.appointment_id)
-    
-    if existing:
+    with conn:
+        cursor = conn.cursor()
+        
         cursor.execute('''
-            UPDATE email_tracking 
-            SET thank_you_sent_12pm = ?,
-                thank_you_sent_7pm = ?,
-                followup_sent = ?,
-                followup_sent_date = ?
-            WHERE appointment_id = ?
+            INSERT INTO email_tracking 
+            (appointment_id, thank_you_sent_12pm, thank_you_sent_7pm, followup_sent, followup_sent_date,
+             thank_you_sent)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(appointment_id) DO UPDATE SET
+                thank_you_sent_12pm = excluded.thank_you_sent_12pm,
+                thank_you_sent_7pm = excluded.thank_you_sent_7pm,
+                followup_sent = excluded.followup_sent,
+                followup_sent_date = excluded.followup_sent_date,
+                thank_you_sent = excluded.thank_you_sent
         ''', (
+            tracking.appointment_id,
             tracking.thank_you_sent_12pm,
             tracking.thank_you_sent_7pm,
             tracking.followup_sent,
             tracking.followup_sent_date,
-            tracking.appointment_id
+            tracking.thank_you_sent
         ))
+
+# email_logs.email_type -> email_tracking flag column
+TRACKING_COLUMNS = {
+    'thank_you': 'thank_you_sent',
+    'thank_you_12pm': 'thank_you_sent_12pm',
+    'thank_you_7pm': 'thank_you_sent_7pm',
+    'followup_7day': 'followup_sent',
+}
+
+def _tracking_column(email_type: str) -> str:
+    if email_type not in TRACKING_COLUMNS:
+        raise ValueError(f'Unknown email type: {email_type}')
+    return TRACKING_COLUMNS[email_type]
+
+def due_appointments_query(email_type: str, date: str) -> Tuple[str, tuple]:
+    """SQL and parameters get_due_appointments runs, also plan-checked by check-indexes"""
+    column = _tracking_column(email_type)
+    return f'''
+        SELECT a.id, a.fresha_id, a.customer_name, a.customer_email, a.appointment_date, a.service_type
+        FROM appointments a
+        LEFT JOIN email_tracking t ON t.appointment_id = a.id
+        WHERE a.appointment_at >= ? AND a.appointment_at < ?
+        AND COALESCE(t.{column}, 0) = 0
+        AND NOT EXISTS (
+            SELECT 1 FROM email_outbox o
+            WHERE o.appointment_id = a.id AND o.email_type = ?
+        )
+        ORDER BY a.id
+    ''', (*day_bounds(date), email_type)
+
+def get_due_appointments(email_type: str, date: str) -> List[Appointment]:
+    """Appointments on the given date that have not yet received email_type.
+    
+    Appointments that already have email_type in the outbox are left to the
+    outbox workers.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(*due_appointments_query(email_type, date))
+    
+    rows = cursor.fetchall()
+    
+    return [_appointment_from_row(row) for row in rows]
+
+# An appointment has had its thank-you once any thank-you flag is set or one is in the outbox
+_NO_THANK_YOU_YET = '''
+    COALESCE(t.thank_you_sent, 0) = 0
+    AND COALESCE(t.thank_you_sent_12pm, 0) = 0
+    AND COALESCE(t.thank_you_sent_7pm, 0) = 0
+    AND NOT EXISTS (
+        SELECT 1 FROM email_outbox o
+        WHERE o.appointment_id = a.id AND o.email_type IN ('thank_you', 'thank_you_12pm', 'thank_you_7pm')
+    )
+'''
+
+def thank_you_candidates_query(since: int, after_id: int = 0, changed_since: int = None) -> Tuple[str, tuple]:
+    """SQL and parameters get_thank_you_candidates runs, also plan-checked by check-indexes"""
+    # Two indexed lookups rather than one OR, which SQLite answers with a table scan
+    select = f'''
+        SELECT a.id, a.fresha_id, a.customer_name, a.customer_email, a.appointment_date,
+               a.service_type, a.appointment_at, a.has_start_time
+        FROM appointments a
+        LEFT JOIN email_tracking t ON t.appointment_id = a.id
+        WHERE {{}} AND a.appointment_at >= ?
+        AND {_NO_THANK_YOU_YET}
+    '''
+    return f'''
+        {select.format('a.id > ?')}
+        UNION
+        {select.format('a.updated_at >= ?')}
+    ''', (after_id, since, changed_since, since)
+
+def get_thank_you_candidates(since: int, after_id: int = 0, changed_since: int = None) -> List[Appointment]:
+    """Appointments from epoch `since` on still owed a thank-you.
+    
+    Only those with id above after_id are returned, plus, with changed_since,
+    those whose details changed at or after that epoch time, in no particular order.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(*thank_you_candidates_query(since, after_id, changed_since))
+    
+    appointments = []
+    for row in cursor.fetchall():
+        appointment = _appointment_from_row(row)
+        appointment.appointment_at = row[6]
+        appointment.has_start_time = bool(row[7])
+        appointments.append(appointment)
+    return appointments
+
+def get_thank_you_candidates_by_id(ids: List[int]) -> List[Appointment]:
+    """Current state of the given appointments, leaving out those that had their thank-you"""
+    if not ids:
+        return []
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    appointments = []
+    for start in range(0, len(ids), _ID_LOOKUP_CHUNK):
+        chunk = ids[start:start + _ID_LOOKUP_CHUNK]
+        placeholders = ', '.join('?' * len(chunk))
+        cursor.execute(f'''
+            SELECT a.id, a.fresha_id, a.customer_name, a.customer_email, a.appointment_date,
+                   a.service_type, a.appointment_at, a.has_start_time
+            FROM appointments a
+            LEFT JOIN email_tracking t ON t.appointment_id = a.id
+            WHERE a.id IN ({placeholders})
+            AND {_NO_THANK_YOU_YET}
+        ''', chunk)
+        for row in cursor.fetchall():
+            appointment = _appointment_from_row(row)
+            appointment.appointment_at = row[6]
+            appointment.has_start_time = bool(row[7])
+            appointments.append(appointment)
+    return appointments
+
+def count_handled_appointments(email_type: str, date: str) -> int:
+    """Appointments on the given date that already received email_type"""
+    column = _tracking_column(email_type)
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(f'''
+        SELECT COUNT(*)
+        FROM appointments a
+        JOIN email_tracking t ON t.appointment_id = a.id
+        WHERE a.appointment_at >= ? AND a.appointment_at < ?
+        AND t.{column} = 1
+    ''', day_bounds(date))
+    
+    return cursor.fetchone()[0]
+
+def set_tracking_flag(cursor, appointment_id: int, email_type: str):
+    """Upsert the tracking flag for email_type inside the caller's transaction"""
+    column = _tracking_column(email_type)
+    if email_type == 'followup_7day':
+        cursor.execute('''
+            INSERT INTO email_tracking (appointment_id, followup_sent, followup_sent_date)
+            VALUES (?, 1, ?)
+            ON CONFLICT(appointment_id) DO UPDATE SET
+                followup_sent = 1,
+                followup_sent_date = excluded.followup_sent_date
+        ''', (appointment_id, datetime.now().isoformat()))
     else:
+        cursor.execute(f'''
+            INSERT INTO email_tracking (appointment_id, {column})
+            VALUES (?, 1)
+            ON CONFLICT(appointment_id) DO UPDATE SET {column} = 1
+        ''', (appointment_id,))
+
+def mark_email_sent(appointment_id: int, email_type: str):
+    """Set the tracking flag for email_type in a single upsert"""
+    conn = get_connection()
+    with conn:
+        set_tracking_flag(conn.cursor(), appointment_id, email_type)
+
+class JobRun:
+    def __init__(self, job_name: str, started_at: str, status: str = 'running',
+                 finished_at: Optional[str] = None, sent: int = 0, skipped: int = 0,
+                 failed: int = 0, id: Optional[int] = None):
+        self.id = id
+        self.job_name = job_name
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.status = status
+        self.sent = sent
+        self.skipped = skipped
+        self.failed = failed
+
+def start_job_run(job_name: str) -> JobRun:
+    """Record the start of a scheduler job run"""
+    run = JobRun(job_name=job_name, started_at=datetime.now().isoformat())
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO email_tracking 
-            (appointment_id, thank_you_sent_12pm, thank_you_sent_7pm, followup_sent, followup_sent_date)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            tracking.appointment_id,
-            tracking.thank_you_sent_12pm,
-            tracking.thank_you_sent_7pm,
-            tracking.followup_sent,
-            tracking.followup_sent_date
-        ))
+            INSERT INTO job_runs (job_name, started_at, status)
+            VALUES (?, ?, ?)
+        ''', (run.job_name, run.started_at, run.status))
+        run.id = cursor.lastrowid
+    return run
+
+def finish_job_run(run: JobRun, status: str):
+    """Store the run's final status and its sent/skipped/failed summary"""
+    run.status = status
+    run.finished_at = datetime.now().isoformat()
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            UPDATE job_runs
+            SET status = ?, finished_at = ?, sent = ?, skipped = ?, failed = ?
+            WHERE id = ?
+        ''', (run.status, run.finished_at, run.sent, run.skipped, run.failed, run.id))
+
+def get_recent_job_runs(limit: int = 10) -> List[JobRun]:
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT id, job_name, started_at, finished_at, status, sent, skipped, failed
+        FROM job_runs
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (limit,))
     
-    conn.commit()
-    conn.close()
+    return [
+        JobRun(id=row[0], job_name=row[1], started_at=row[2], finished_at=row[3],
+               status=row[4], sent=row[5], skipped=row[6], failed=row[7])
+        for row in cursor.fetchall()
+    ]
@@ -0,0 +1,202 @@
+import time
+from typing import Optional, List, Tuple
+from src.database.db import get_connection
+from src.database.models import Appointment, set_tracking_flag
+from src.utils.config import config
+from src.utils.retry import backoff_delay, is_transient_email_error
+from src.utils.rate_limiter import RateLimitExceeded
+from src.utils.circuit_breaker import CircuitOpenError
+import logging
+
+logger = logging.getLogger('fresha_automation')
+
+class LeaseLostError(Exception):
+    """Another worker reclaimed a message after this worker's lease expired"""
+
+class OutboxMessage:
+    def __init__(self, id: int, appointment: Appointment, email_type: str,
+                 message: Optional[bytes], attempts: int = 0):
+        self.id = id
+        self.appointment = appointment
+        self.email_type = email_type
+        self.message = message
+        self.attempts = attempts
+
+def enqueue_emails(entries: List[Tuple[Appointment, str, bytes]]) -> int:
+    """Add (appointment, email_type, message) entries to the outbox in one transaction.
+    
+    Entries already in the outbox are left alone, so overlapping jobs cannot
+    enqueue the same email twice. Returns how many were added.
+    """
+    if not entries:
+        return 0
+    
+    now = int(time.time())
+    conn = get_connection()
+    with conn:
+        before = conn.total_changes
+        conn.executemany('''
+            INSERT INTO email_outbox (appointment_id, email_type, recipient, message, next_attempt_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(appointment_id, email_type) DO NOTHING
+        ''', [
+            (appointment.id, email_type, appointment.customer_email, message, now)
+            for appointment, email_type, message in entries
+        ])
+        added = conn.total_changes - before
+    return added
+
+def claim_messages(owner: str, limit: int, email_type: Optional[str] = None,
+                   shard: Optional[Tuple[int, int]] = None) -> List[OutboxMessage]:
+    """Atomically lease up to limit due messages to owner.
+    
+    Due messages are pending ones whose next_attempt_at has passed and ones
+    whose previous lease expired without being completed. shard=(index, count)
+    restricts the claim to appointments with appointment_id % count == index.
+    """
+    now = int(time.time())
+    filters, params = '', [now, now]
+    if email_type:
+        filters += ' AND email_type = ?'
+        params.append(email_type)
+    if shard:
+        index, count = shard
+        filters += ' AND appointment_id % ? = ?'
+        params.extend((count, index))
+    params.append(limit)
+    
+    conn = get_connection()
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id FROM email_outbox
+            WHERE ((status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND lease_expires_at <= ?))
+            {filters}
+            ORDER BY next_attempt_at
+            LIMIT ?
+        ''', params)
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return []
+        
+        placeholders = ', '.join('?' * len(ids))
+        # A reclaimed lease means the last worker died mid-send; count it as an attempt
+        cursor.execute(f'''
+            UPDATE email_outbox
+            SET status = 'sending', lease_owner = ?, lease_expires_at = ?,
+                attempts = attempts + (status = 'sending'), updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({placeholders})
+        ''', (owner, now + config.EMAIL_OUTBOX_LEASE_SECONDS, *ids))
+        
+        cursor.execute(f'''
+            SELECT o.id, o.email_type, o.message, o.attempts, o.recipient,
+                   a.id, a.fresha_id, a.customer_name, a.appointment_date, a.service_type
+            FROM email_outbox o
+            JOIN appointments a ON a.id = o.appointment_id
+            WHERE o.id IN ({placeholders})
+        ''', ids)
+        rows = cursor.fetchall()
+    
+    return [
+        OutboxMessage(
+            id=row[0],
+            email_type=row[1],
+            message=row[2],
+            attempts=row[3],
+            appointment=Appointment(
+                id=row[5],
+                fresha_id=row[6],
+                customer_name=row[7],
+                customer_email=row[4],
+                appointment_date=row[8],
+                service_type=row[9]
+            )
+        )
+        for row in rows
+    ]
+
+def renew_lease(message: OutboxMessage, owner: str) -> bool:
+    """Extend owner's lease on a message by EMAIL_OUTBOX_LEASE_SECONDS from now.
+    
+    Returns False if the lease has already passed to another worker.
+    """
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute('''
+            UPDATE email_outbox
+            SET lease_expires_at = ?
+            WHERE id = ? AND status = 'sending' AND lease_owner = ?
+        ''', (int(time.time()) + config.EMAIL_OUTBOX_LEASE_SECONDS, message.id, owner))
+        return cursor.rowcount == 1
+
+def complete_message(message: OutboxMessage, owner: str) -> bool:
+    """Mark a sent message done and set its tracking flag in one transaction.
+    
+    Returns False if the lease had already passed to another worker.
+    """
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE email_outbox
+            SET status = 'sent', sent_at = CURRENT_TIMESTAMP, lease_owner = NULL,
+                lease_expires_at = NULL, last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND lease_owner = ?
+        ''', (message.id, owner))
+        held = cursor.rowcount == 1
+        set_tracking_flag(cursor, message.appointment.id, message.email_type)
+    
+    if not held:
+        logger.warning(f'Lease on outbox message {message.id} expired before it was sent; '
+                       f'{message.appointment.customer_email} may receive {message.email_type} twice')
+    return held
+
+def release_message(message: OutboxMessage, owner: str, error: Exception) -> Optional[int]:
+    """Return a failed message to the outbox for a later attempt.
+    
+    Transient failures are retried with exponential backoff until
+    EMAIL_RETRY_MAX_ATTEMPTS; sends held back by an open circuit wait out the
+    cool-down without using up an attempt. Returns the epoch time of the next
+    attempt, or None if the message is marked failed for good.
+    """
+    now = time.time()
+    attempts = message.attempts
+    if isinstance(error, CircuitOpenError):
+        status, next_attempt_at = 'pending', int(now + error.retry_after)
+    elif is_transient_email_error(error) and attempts + 1 < config.EMAIL_RETRY_MAX_ATTEMPTS:
+        attempts += 1
+        delay = backoff_delay(attempts, config.EMAIL_RETRY_BASE_DELAY, config.EMAIL_RETRY_MAX_DELAY)
+        if isinstance(error, RateLimitExceeded):
+            delay = max(delay, error.wait_time)
+        status, next_attempt_at = 'pending', int(now + delay)
+    else:
+        attempts += 1
+        status, next_attempt_at = 'failed', int(now)
+    
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            UPDATE email_outbox
+            SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?,
+                lease_owner = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND lease_owner = ?
+        ''', (status, attempts, next_attempt_at, str(error), message.id, owner))
+    
+    if status == 'failed':
+        logger.warning(f'Giving up on {message.email_type} for appointment {message.appointment.id} '
+                       f'after {attempts} attempts')
+        return None
+    return next_attempt_at
+
+def count_pending_messages(email_type: Optional[str] = None) -> int:
+    conn = get_connection()
+    cursor = conn.cursor()
+    if email_type:
+        cursor.execute('''
+            SELECT COUNT(*) FROM email_outbox WHERE status IN ('pending', 'sending') AND email_type = ?
+        ''', (email_type,))
+    else:
+        cursor.execute("SELECT COUNT(*) FROM email_outbox WHERE status IN ('pending', 'sending')")
+    return cursor.fetchone()[0]
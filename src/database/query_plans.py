@@ -0,0 +1,106 @@
+import sqlite3
+from typing import Dict, List
+from src.database.db import get_connection
+from src.database.models import due_appointments_query, thank_you_candidates_query
+
+# Hot queries from metrics, health checks, the dashboard and response tracking,
+# with representative parameters. Each must be answerable without a full table scan.
+HOT_QUERIES = {
+    'models.appointments_by_date': (
+        'SELECT * FROM appointments WHERE appointment_at >= ? AND appointment_at < ?',
+        (1767225600, 1767312000)
+    ),
+    # Built by the model functions themselves, so the checked plan is the one they run
+    'models.due_appointments': due_appointments_query('thank_you_12pm', '2026-01-01'),
+    'models.thank_you_candidates': thank_you_candidates_query(1767225600, 0, 1767225600),
+    'outbox.claim': (
+        '''
+        SELECT id FROM email_outbox
+        WHERE ((status = 'pending' AND next_attempt_at <= ?)
+               OR (status = 'sending' AND lease_expires_at <= ?))
+        ORDER BY next_attempt_at
+        LIMIT ?
+        ''',
+        (1767225600, 1767225600, 50)
+    ),
+    'metrics.email_stats': (
+        '''
+        SELECT status, email_type, COUNT(*) FROM email_logs
+        WHERE sent_at > ?
+        GROUP BY status, email_type
+        ''',
+        ('2026-01-01T00:00:00',)
+    ),
+    'health.recent_errors': (
+        '''
+        SELECT COUNT(*) FROM email_logs
+        WHERE status = 'failed'
+        AND sent_at > datetime('now', '-1 hour')
+        ''',
+        ()
+    ),
+    'dashboard.status_count': (
+        "SELECT COUNT(*) FROM email_logs WHERE status = 'sent'",
+        ()
+    ),
+    'dashboard.recent_emails': (
+        "SELECT COUNT(*) FROM email_logs WHERE sent_at > datetime('now', '-24 hours')",
+        ()
+    ),
+    'cli.status_breakdown': (
+        'SELECT status, COUNT(*) FROM email_logs GROUP BY status',
+        ()
+    ),
+    'responses.update_click': (
+        '''
+        UPDATE customer_responses
+        SET clicked = 1, response_date = ?
+        WHERE appointment_id = ? AND email_type = ? AND customer_email = ?
+        ''',
+        ('2026-01-01T00:00:00', 1, 'thank_you_12pm', 'customer@example.com')
+    ),
+    'responses.customer_engagement': (
+        '''
+        SELECT COUNT(*), SUM(opened), SUM(clicked), SUM(replied)
+        FROM customer_responses
+        WHERE customer_email = ?
+        ''',
+        ('customer@example.com',)
+    ),
+}
+
+def explain(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> List[str]:
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+def is_full_scan(detail: str) -> bool:
+    # A plain SCAN reads every row; so does SCAN ... USING INDEX, plus a table
+    # lookup per row. Only a covering-index scan avoids touching the table.
+    return detail.startswith('SCAN ') and 'COVERING INDEX' not in detail
+
+def schema_copy(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """In-memory database with the same tables and indexes but no rows or statistics.
+    
+    On small tables the planner may rightly prefer a scan, so plans are checked
+    against the bare schema to prove the indexes are usable regardless of data.
+    """
+    copy = sqlite3.connect(':memory:')
+    rows = conn.execute('''
+        SELECT sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND type IN ('table', 'index') AND name NOT LIKE 'sqlite_%'
+        ORDER BY type = 'index'
+    ''').fetchall()
+    for (sql,) in rows:
+        copy.execute(sql)
+    return copy
+
+def find_full_scans(conn: sqlite3.Connection = None) -> Dict[str, List[str]]:
+    """Map each hot query that still scans a whole table to its plan"""
+    conn = schema_copy(conn or get_connection())
+    offenders = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = explain(conn, sql, params)
+        if any(is_full_scan(detail) for detail in plan):
+            offenders[name] = plan
+    conn.close()
+    return offenders
@@ -28,67 +28,60 @@ class ResponseTracker:
         ''')
         
         conn.commit()
-        conn.close()
     
     @staticmethod
     def record_email_open(appointment_id: int, email_type: str, customer_email: str):
         """Record email open (via tracking pixel)"""
         conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO customer_responses 
-            (appointment_id, customer_email, email_type, opened, response_date)
-            VALUES (?, ?, ?, 1, ?)
-            ON CONFLICT(appointment_id, email_type) DO UPDATE SET opened = 1, response_date = ?
-        ''', (appointment_id, customer_email, email_type, datetime.now().isoformat(), datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+        with conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO customer_responses 
+                (appointment_id, customer_email, email_type, opened, response_date)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT(appointment_id, email_type) DO UPDATE SET opened = 1, response_date = ?
+            ''', (appointment_id, customer_email, email_type, datetime.now().isoformat(), datetime.now().isoformat()))
     
     @staticmethod
     def record_email_click(appointment_id: int, email_type: str, customer_email: str):
         """Record email link click"""
         conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE customer_responses 
-            SET clicked = 1, response_date = ?
-            WHERE appointment_id = ? AND email_type = ? AND customer_email = ?
-        ''', (datetime.now().isoformat(), appointment_id, email_type, customer_email))
-        
-        if cursor.rowcount == 0:
+        with conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
-                INSERT INTO customer_responses 
-                (appointment_id, customer_email, email_type, clicked, response_date)
-                VALUES (?, ?, ?, 1, ?)
-            ''', (appointment_id, customer_email, email_type, datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+                UPDATE customer_responses 
+                SET clicked = 1, response_date = ?
+                WHERE appointment_id = ? AND email_type = ? AND customer_email = ?
+            ''', (datetime.now().isoformat(), appointment_id, email_type, customer_email))
+            
+            if cursor.rowcount == 0:
+                cursor.execute('''
+                    INSERT INTO customer_responses 
+                    (appointment_id, customer_email, email_type, clicked, response_date)
+                    VALUES (?, ?, ?, 1, ?)
+                ''', (appointment_id, customer_email, email_type, datetime.now().isoformat()))
     
     @staticmethod
     def record_feedback(appointment_id: int, email_type: str, customer_email: str, feedback: str):
         """Record customer feedback"""
         conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE customer_responses 
-            SET replied = 1, feedback = ?, response_date = ?
-            WHERE appointment_id = ? AND email_type = ? AND customer_email = ?
-        ''', (feedback, datetime.now().isoformat(), appointment_id, email_type, customer_email))
-        
-        if cursor.rowcount == 0:
+        with conn:
+            cursor = conn.cursor()
+            
             cursor.execute('''
-                INSERT INTO customer_responses 
-                (appointment_id, customer_email, email_type, replied, feedback, response_date)
-                VALUES (?, ?, ?, 1, ?, ?)
-            ''', (appointment_id, customer_email, email_type, feedback, datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+                UPDATE customer_responses 
+                SET replied = 1, feedback = ?, response_date = ?
+                WHERE appointment_id = ? AND email_type = ? AND customer_email = ?
+            ''', (feedback, datetime.now().isoformat(), appointment_id, email_type, customer_email))
+            
+            if cursor.rowcount == 0:
+                cursor.execute('''
+                    INSERT INTO customer_responses 
+                    (appointment_id, customer_email, email_type, replied, feedback, response_date)
+                    VALUES (?, ?, ?, 1, ?, ?)
+                ''', (appointment_id, customer_email, email_type, feedback, datetime.now().isoformat()))
     
     @staticmethod
     def get_response_stats() -> Dict:
@@ -108,7 +101,6 @@ class ResponseTracker:
         cursor.execute('SELECT COUNT(*) FROM customer_responses')
         total = cursor.fetchone()[0]
         
-        conn.close()
         
         return {
             'total_emails': total,
@@ -137,7 +129,6 @@ class ResponseTracker:
         ''', (customer_email,))
         
         result = cursor.fetchone()
-        conn.close()
         
         if result and result[0] > 0:
             total, opened, clicked, replied = result
@@ -25,7 +25,6 @@ class CustomerSegmentation:
         ''')
         
         customers = cursor.fetchall()
-        conn.close()
         
         segments = {
             'vip': [],      # 5+ appointments
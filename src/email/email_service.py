@@ -1,41 +1,280 @@
+import atexit
+import base64
 import smtplib
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable
+from queue import LifoQueue, Empty
+from threading import BoundedSemaphore
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.header import Header
+from email.utils import formataddr
 from src.utils.config import config
 from src.utils.logger import logger
 from src.email.templates import get_thank_you_email, get_followup_email
-from src.utils.retry import retry_email_operation
+from src.utils.rate_limiter import RateLimiter
+from src.utils.circuit_breaker import CircuitBreaker
+
+class _PooledConnection:
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+class SMTPConnectionPool:
+    """Pool of authenticated SMTP sessions shared by all EmailService instances"""
+    
+    # Connections idle for less than this are trusted without a NOOP round trip
+    NOOP_AFTER = 5
+    
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 size: int = 3, max_messages: int = 100, idle_timeout: int = 60,
+                 timeout: int = 30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = LifoQueue()
+        self._slots = BoundedSemaphore(size)
+    
+    def _connect(self) -> _PooledConnection:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.port == 587:
+                server.starttls()
+            server.login(self.user, self.password)
+        except Exception:
+            self._quit(server)
+            raise
+        logger.debug(f'Opened SMTP connection to {self.host}:{self.port}')
+        return _PooledConnection(server)
+    
+    @staticmethod
+    def _quit(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+    
+    def _is_usable(self, conn: _PooledConnection) -> bool:
+        idle_for = time.monotonic() - conn.last_used
+        if conn.messages_sent >= self.max_messages or idle_for >= self.idle_timeout:
+            return False
+        if idle_for < self.NOOP_AFTER:
+            return True
+        try:
+            return conn.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    def _checkout(self) -> _PooledConnection:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                return self._connect()
+            if self._is_usable(conn):
+                return conn
+            self._quit(conn.server)
+    
+    @contextmanager
+    def connection(self):
+        """Borrow an authenticated connection, returning it to the pool afterwards"""
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except (smtplib.SMTPServerDisconnected, OSError):
+            if conn:
+                self._quit(conn.server)
+                conn = None
+            raise
+        finally:
+            if conn:
+                conn.last_used = time.monotonic()
+                if conn.messages_sent >= self.max_messages:
+                    self._quit(conn.server)
+                else:
+                    self._idle.put(conn)
+            self._slots.release()
+    
+    def _send(self, send: Callable[[smtplib.SMTP], None]):
+        """Run send on a pooled connection, reconnecting once if the server dropped it"""
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    send(conn.server)
+                    conn.messages_sent += 1
+                    return
+            except smtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
+                logger.warning('SMTP connection dropped by server, reconnecting')
+    
+    def send_message(self, msg):
+        self._send(lambda server: server.send_message(msg))
+    
+    def sendmail(self, from_addr: str, to_addrs: list, msg: bytes):
+        self._send(lambda server: server.sendmail(from_addr, to_addrs, msg))
+    
+    def verify(self):
+        with self.connection() as conn:
+            code, response = conn.server.noop()
+            if code != 250:
+                raise smtplib.SMTPResponseException(code, response)
+    
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                return
+            self._quit(conn.server)
+
+smtp_pool = SMTPConnectionPool(
+    config.SMTP_HOST,
+    config.SMTP_PORT,
+    config.SMTP_USER,
+    config.SMTP_PASSWORD,
+    size=config.SMTP_POOL_SIZE,
+    max_messages=config.SMTP_MAX_MESSAGES_PER_CONNECTION,
+    idle_timeout=config.SMTP_IDLE_TIMEOUT
+)
+atexit.register(smtp_pool.close)
+
+# Shared send quota: the SMTP account per minute and per day, and each
+# recipient domain per minute
+send_rate_limiter = RateLimiter()
+send_rate_limiter.add_limit('account:minute', config.SMTP_RATE_LIMIT_PER_MINUTE, 60)
+send_rate_limiter.add_limit('account:day', config.SMTP_RATE_LIMIT_PER_DAY, 24 * 60 * 60)
+send_rate_limiter.add_limit('domain:', config.SMTP_DOMAIN_RATE_LIMIT_PER_MINUTE, 60)
+
+def set_send_quota_share(shares: int):
+    """Limit this process to 1/shares of the send quota, for sharded sender processes"""
+    send_rate_limiter.add_limit('account:minute', max(1, config.SMTP_RATE_LIMIT_PER_MINUTE // shares), 60)
+    send_rate_limiter.add_limit('account:day', max(1, config.SMTP_RATE_LIMIT_PER_DAY // shares), 24 * 60 * 60)
+    send_rate_limiter.add_limit('domain:', max(1, config.SMTP_DOMAIN_RATE_LIMIT_PER_MINUTE // shares), 60)
+
+def is_smtp_outage(error: Exception) -> bool:
+    """Whether a failure points at the SMTP server rather than one message"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                          smtplib.SMTPHeloError, smtplib.SMTPAuthenticationError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        # 421: service not available, closing transmission channel
+        return error.smtp_code == 421
+    # Other SMTP errors (refused recipients, bad data) concern a single message
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+smtp_breaker = CircuitBreaker(
+    'SMTP',
+    failure_threshold=config.SMTP_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=config.SMTP_CIRCUIT_RESET_TIMEOUT,
+    is_failure=is_smtp_outage
+)
+
+def rate_limit_keys(recipient: str) -> tuple:
+    domain = recipient.rpartition('@')[2].lower()
+    return ('account:minute', 'account:day', f'domain:{domain}')
+
+# Multipart boundary shared by all messages; '-' never occurs in base64 bodies
+_BOUNDARY = f'fresha-alt-{uuid.uuid4().hex}'.encode('ascii')
+
+_PART_HEADERS = {
+    (subtype, charset, encoding): (
+        f'Content-Type: text/{subtype}; charset="{charset}"\r\n'
+        f'MIME-Version: 1.0\r\n'
+        f'Content-Transfer-Encoding: {encoding}\r\n\r\n'
+    ).encode('ascii')
+    for subtype in ('plain', 'html')
+    for charset, encoding in (('us-ascii', '7bit'), ('utf-8', 'base64'))
+}
+
+def _crlf(body: str) -> str:
+    return body.replace('\r\n', '\n').replace('\n', '\r\n')
+
+def _encode_part(body: str, subtype: str) -> bytes:
+    if body.isascii() and all(len(line) < 998 for line in body.split('\n')):
+        return _PART_HEADERS[(subtype, 'us-ascii', '7bit')] + _crlf(body).encode('ascii')
+    encoded = base64.encodebytes(body.encode('utf-8')).replace(b'\n', b'\r\n')
+    return _PART_HEADERS[(subtype, 'utf-8', 'base64')] + encoded
+
+def _encode_header(value: str) -> str:
+    # Subjects can carry scraped customer names; a line break would start a new header
+    if '\r' in value or '\n' in value:
+        raise ValueError(f'Header value may not contain line breaks: {value!r}')
+    return value if value.isascii() else Header(value, 'utf-8').encode(linesep='\r\n')
+
+@lru_cache(maxsize=64)
+def _static_headers(subject: str, from_header: str) -> bytes:
+    """Headers that are identical for every recipient of a template"""
+    return (
+        f'Content-Type: multipart/alternative; boundary="{_BOUNDARY.decode()}"\r\n'
+        f'MIME-Version: 1.0\r\n'
+        f'Subject: {_encode_header(subject)}\r\n'
+        f'From: {_encode_header(from_header)}\r\n'
+    ).encode('ascii')
+
+def build_message(from_header: str, to: str, template: dict) -> bytes:
+    """Serialize a rendered template as a multipart/alternative message"""
+    separator = b'\r\n--' + _BOUNDARY + b'\r\n'
+    return b''.join((
+        _static_headers(template['subject'], from_header),
+        b'To: ', _encode_header(to).encode('ascii'), b'\r\n\r\n',
+        b'--', _BOUNDARY, b'\r\n',
+        _encode_part(template['text'], 'plain'),
+        separator,
+        _encode_part(template['html'], 'html'),
+        b'\r\n--', _BOUNDARY, b'--\r\n'
+    ))
 
 class EmailService:
-    def __init__(self):
+    def __init__(self, pool: SMTPConnectionPool = None, rate_limiter: RateLimiter = None,
+                 breaker: CircuitBreaker = None):
         self.smtp_host = config.SMTP_HOST
         self.smtp_port = config.SMTP_PORT
         self.smtp_user = config.SMTP_USER
         self.smtp_password = config.SMTP_PASSWORD
         self.from_name = config.SMTP_FROM_NAME
         self.from_email = config.SMTP_FROM_EMAIL
+        self.from_header = formataddr((self.from_name, self.from_email))
+        self.pool = pool or smtp_pool
+        self.rate_limiter = rate_limiter or send_rate_limiter
+        self.breaker = breaker or smtp_breaker
     
     def _send_email(self, customer_email: str, template: dict):
-        """Internal method to send email with retry logic"""
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = template['subject']
-        msg['From'] = f'{self.from_name} <{self.from_email}>'
-        msg['To'] = customer_email
-        
-        part1 = MIMEText(template['text'], 'plain')
-        part2 = MIMEText(template['html'], 'html')
-        
-        msg.attach(part1)
-        msg.attach(part2)
-        
-        def _send():
-            with smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30) as server:
-                if self.smtp_port == 587:
-                    server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-        
-        return retry_email_operation(_send)
+        """Send one message. Failures are raised for the caller to queue a retry."""
+        msg = build_message(self.from_header, customer_email, template)
+        return self.send_raw(customer_email, msg)
+    
+    def build_email(self, email_type: str, customer_email: str, customer_name: str,
+                    service_type: str = None) -> bytes:
+        """Render the message for an email_type ('thank_you_*' or 'followup_7day')"""
+        if email_type == 'followup_7day':
+            template = get_followup_email(customer_name)
+        elif email_type.startswith('thank_you'):
+            template = get_thank_you_email(customer_name, service_type)
+        else:
+            raise ValueError(f'Unknown email type: {email_type}')
+        return build_message(self.from_header, customer_email, template)
+    
+    def send_raw(self, customer_email: str, msg: bytes):
+        """Send a message built by build_email"""
+        return self.breaker.call(self._deliver, customer_email, msg)
+    
+    def _deliver(self, customer_email: str, msg: bytes):
+        self.rate_limiter.acquire(*rate_limit_keys(customer_email), max_wait=config.SMTP_RATE_LIMIT_MAX_WAIT)
+        return self.pool.sendmail(self.from_email, [customer_email], msg)
     
     def send_thank_you_email(self, customer_email: str, customer_name: str, service_type: str = None) -> bool:
         try:
@@ -68,11 +307,7 @@ class EmailService:
             msg['From'] = f'{self.from_name} <{self.from_email}>'
             msg['To'] = config.ALERT_EMAIL
             
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                if self.smtp_port == 587:
-                    server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
+            self.pool.send_message(msg)
             
             logger.info(f'Alert email sent: {subject}')
         except Exception as error:
@@ -80,10 +315,7 @@ class EmailService:
     
     def verify_connection(self) -> bool:
         try:
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                if self.smtp_port == 587:
-                    server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
+            self.pool.verify()
             logger.info('SMTP connection verified')
             return True
         except Exception as error:
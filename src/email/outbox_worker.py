@@ -0,0 +1,117 @@
+import os
+import socket
+import uuid
+from typing import Optional, Tuple
+from src.database.models import JobRun, email_log_writer
+from src.database.outbox import (
+    LeaseLostError, OutboxMessage, claim_messages, complete_message, release_message, renew_lease
+)
+from src.email.email_service import EmailService
+from src.email.send_engine import SendEngine, send_engine as shared_send_engine
+from src.utils.circuit_breaker import CircuitOpenError, CLOSED
+from src.utils.config import config
+from src.utils.logger import logger
+
+# Failure type reported to AlertService for each email type
+ALERT_LABELS = {
+    'thank_you': 'Thank-You Email',
+    'thank_you_12pm': 'Thank-You Email',
+    'thank_you_7pm': 'Thank-You Email',
+    'followup_7day': 'Follow-Up Email',
+}
+
+class OutboxWorker:
+    """Sends due outbox messages under a lease and records each outcome.
+    
+    Any number of workers, in this process or others, can drain the same
+    outbox: claim_messages hands each message to exactly one of them. A
+    worker given shard=(index, count) only takes appointments in that shard.
+    """
+    
+    def __init__(self, email_service: EmailService = None, alert_service=None,
+                 send_engine: SendEngine = None, batch_size: int = None,
+                 shard: Optional[Tuple[int, int]] = None):
+        self.email_service = email_service or EmailService()
+        self.alert_service = alert_service
+        self.send_engine = send_engine or shared_send_engine
+        self.batch_size = batch_size or config.EMAIL_OUTBOX_BATCH_SIZE
+        self.shard = shard
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    
+    def _send(self, message: OutboxMessage):
+        appointment = message.appointment
+        # A batch waiting on the send quota can outlast the lease it was claimed
+        # under; renewing here covers the quota wait and the send, and a message
+        # another worker has since reclaimed is left to that worker
+        if not renew_lease(message, self.owner):
+            raise LeaseLostError()
+        if message.message is None:
+            message.message = self.email_service.build_email(
+                message.email_type,
+                appointment.customer_email,
+                appointment.customer_name,
+                appointment.service_type
+            )
+        self.email_service.send_raw(appointment.customer_email, message.message)
+    
+    def _log_outcome(self, message: OutboxMessage, status: str, error_message: Optional[str]):
+        # A log write can flush the buffer and hit e.g. a busy database; that
+        # says nothing about the send, so it must not count as a failed one
+        try:
+            email_log_writer.write(message.appointment.id, message.email_type, status, error_message)
+        except Exception as error:
+            logger.error(f'Failed to log {status} {message.email_type} email for outbox message {message.id}',
+                         extra={'error': str(error)})
+    
+    def _handle_send_failure(self, message: OutboxMessage, error: Exception):
+        appointment = message.appointment
+        error_message = str(error)
+        logger.error(f'Failed to send {message.email_type} email to {appointment.customer_email}',
+                     extra={'error': error_message})
+        
+        self._log_outcome(message, 'failed', error_message)
+        
+        release_message(message, self.owner, error)
+        
+        # An open circuit was alerted on once when it tripped
+        if self.alert_service is None or isinstance(error, CircuitOpenError):
+            return
+        self.alert_service.handle_failure(ALERT_LABELS.get(message.email_type, 'Email'), error, {
+            'appointmentId': appointment.id,
+            'customerEmail': appointment.customer_email,
+            'emailType': message.email_type
+        })
+    
+    def run(self, run: JobRun, email_type: Optional[str] = None) -> JobRun:
+        """Drain due messages (of one email_type, or all), adding outcomes to run"""
+        while True:
+            messages = claim_messages(self.owner, self.batch_size, email_type, self.shard)
+            if not messages:
+                break
+            
+            for message, send_error in self.send_engine.run(messages, self._send):
+                if isinstance(send_error, LeaseLostError):
+                    logger.info(f'Outbox message {message.id} was reclaimed by another worker, skipping it')
+                    run.skipped += 1
+                    continue
+                if send_error:
+                    run.failed += 1
+                    self._handle_send_failure(message, send_error)
+                    continue
+                
+                try:
+                    complete_message(message, self.owner)
+                except Exception as error:
+                    run.failed += 1
+                    self._handle_send_failure(message, error)
+                    continue
+                
+                run.sent += 1
+                logger.info(f'{message.email_type} email sent to {message.appointment.customer_email}')
+                self._log_outcome(message, 'sent', None)
+            
+            # Leave the rest for a later run rather than spin while the server is down
+            if self.email_service.breaker.state != CLOSED:
+                break
+        
+        return run
@@ -0,0 +1,43 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Any
+from src.utils.config import config
+from src.utils.logger import logger
+
+class SendEngine:
+    """Bounded-concurrency runner for outgoing emails.
+    
+    Only the send callable runs on worker threads. Results are yielded back
+    to the caller's thread as they complete, so tracking updates, logging and
+    alerting stay single-threaded. The worker threads are started once and
+    kept for later batches, so their database connections are reused too.
+    """
+    
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max(1, max_workers or config.EMAIL_SEND_WORKERS)
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='email-send')
+            return self._executor
+    
+    def run(self, items: Iterable[Any], send: Callable[[Any], Any]) -> Iterator[Tuple[Any, Optional[Exception]]]:
+        """Run send(item) for every item, yielding (item, error) in completion order"""
+        items = list(items)
+        if not items:
+            return
+        
+        workers = min(self.max_workers, len(items))
+        logger.info(f'Sending {len(items)} emails with {workers} workers')
+        
+        executor = self._get_executor()
+        futures = {executor.submit(send, item): item for item in items}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], error
+
+# Shared by the outbox workers in a process, so there is one pool of send threads
+send_engine = SendEngine()
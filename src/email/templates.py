@@ -1,27 +1,32 @@
-def get_thank_you_email(customer_name: str, service_type: str = None) -> dict:
-    service_text = service_type or 'nail service'
-    
-    html = f"""
+import html
+import string
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from src.utils.config import config
+from src.utils.logger import logger
+
+THANK_YOU_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="utf-8">
         <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #f8f9fa; padding: 20px; text-align: center; }}
-            .content {{ padding: 20px; }}
-            .footer {{ text-align: center; padding: 20px; font-size: 12px; color: #666; }}
+            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+            .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+            .header { background-color: #f8f9fa; padding: 20px; text-align: center; }
+            .content { padding: 20px; }
+            .footer { text-align: center; padding: 20px; font-size: 12px; color: #666; }
         </style>
     </head>
     <body>
         <div class="container">
             <div class="header">
-                <h1>Thank You, {customer_name}!</h1>
+                <h1>Thank You, $customer_name!</h1>
             </div>
             <div class="content">
-                <p>Dear {customer_name},</p>
-                <p>Thank you for choosing us for your {service_text} today! We hope you had a wonderful experience.</p>
+                <p>Dear $customer_name,</p>
+                <p>Thank you for choosing us for your $service_text today! We hope you had a wonderful experience.</p>
                 <p>We truly appreciate your business and look forward to serving you again soon.</p>
                 <p>If you have any questions or feedback, please don't hesitate to reach out to us.</p>
                 <p>Best regards,<br>The Nail Salon Team</p>
@@ -33,13 +38,13 @@ def get_thank_you_email(customer_name: str, service_type: str = None) -> dict:
     </body>
     </html>
     """
+
+THANK_YOU_TEXT = """
+    Thank You, $customer_name!
     
-    text = f"""
-    Thank You, {customer_name}!
-    
-    Dear {customer_name},
+    Dear $customer_name,
     
-    Thank you for choosing us for your {service_text} today! We hope you had a wonderful experience.
+    Thank you for choosing us for your $service_text today! We hope you had a wonderful experience.
     
     We truly appreciate your business and look forward to serving you again soon.
     
@@ -51,34 +56,27 @@ def get_thank_you_email(customer_name: str, service_type: str = None) -> dict:
     ---
     This is an automated message. Please do not reply to this email.
     """
-    
-    return {
-        'subject': 'Thank You for Your Visit!',
-        'html': html,
-        'text': text
-    }
 
-def get_followup_email(customer_name: str) -> dict:
-    html = f"""
+FOLLOWUP_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="utf-8">
         <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #f8f9fa; padding: 20px; text-align: center; }}
-            .content {{ padding: 20px; }}
-            .footer {{ text-align: center; padding: 20px; font-size: 12px; color: #666; }}
+            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+            .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+            .header { background-color: #f8f9fa; padding: 20px; text-align: center; }
+            .content { padding: 20px; }
+            .footer { text-align: center; padding: 20px; font-size: 12px; color: #666; }
         </style>
     </head>
     <body>
         <div class="container">
             <div class="header">
-                <h1>Hi {customer_name}!</h1>
+                <h1>Hi $customer_name!</h1>
             </div>
             <div class="content">
-                <p>Dear {customer_name},</p>
+                <p>Dear $customer_name,</p>
                 <p>It's been a week since your visit, and we wanted to check in with you.</p>
                 <p><strong>How are your nails doing? Are they lasting well?</strong></p>
                 <p>We'd love to hear about your experience and any feedback you might have. Your satisfaction is our top priority!</p>
@@ -93,11 +91,11 @@ def get_followup_email(customer_name: str) -> dict:
     </body>
     </html>
     """
+
+FOLLOWUP_TEXT = """
+    Hi $customer_name!
     
-    text = f"""
-    Hi {customer_name}!
-    
-    Dear {customer_name},
+    Dear $customer_name,
     
     It's been a week since your visit, and we wanted to check in with you.
     
@@ -115,9 +113,111 @@ def get_followup_email(customer_name: str) -> dict:
     ---
     This is an automated message. Please do not reply to this email.
     """
+
+def _single_line(value: str) -> str:
+    # Subject slots carry scraped names; line breaks there would end the header
+    return ' '.join(value.split())
+
+class CompiledTemplate:
+    """Template parsed once into static text and $slot references.
     
-    return {
-        'subject': 'How Are Your Nails Doing?',
-        'html': html,
-        'text': text
-    }
+    Rendering only joins the precomputed static segments with the slot values,
+    so nothing is re-parsed or re-formatted per recipient.
+    """
+    
+    def __init__(self, source: str, escape: Optional[Callable[[str], str]] = None):
+        self.escape = escape
+        self.segments = []
+        self.slots = set()
+        position = 0
+        for match in string.Template.pattern.finditer(source):
+            self.segments.append((False, source[position:match.start()]))
+            name = match.group('named') or match.group('braced')
+            if name:
+                self.segments.append((True, name))
+                self.slots.add(name)
+            elif match.group('escaped') is not None:
+                self.segments.append((False, '$'))
+            else:
+                raise ValueError(f'Invalid placeholder in template at offset {match.start()}')
+            position = match.end()
+        self.segments.append((False, source[position:]))
+        self.segments = [(is_slot, part) for is_slot, part in self.segments if is_slot or part]
+    
+    def render(self, values: Dict[str, str]) -> str:
+        escape = self.escape
+        return ''.join(
+            (escape(str(values[part])) if escape else str(values[part])) if is_slot else part
+            for is_slot, part in self.segments
+        )
+
+class EmailTemplate:
+    def __init__(self, name: str, subject: str, html_source: str, text_source: str,
+                 cache_size: int = 1024):
+        self.name = name
+        self.subject = CompiledTemplate(subject, escape=_single_line)
+        self.html = CompiledTemplate(html_source, escape=html.escape)
+        self.text = CompiledTemplate(text_source)
+        self._render_cached = lru_cache(maxsize=cache_size)(self._render)
+    
+    def _render(self, items: tuple) -> dict:
+        values = dict(items)
+        return {
+            'subject': self.subject.render(values),
+            'html': self.html.render(values),
+            'text': self.text.render(values)
+        }
+    
+    def render(self, **values) -> dict:
+        """Render all parts; repeated slot values are served from an LRU cache"""
+        # Callers may mutate the returned dict, so hand out a copy
+        return dict(self._render_cached(tuple(sorted(values.items()))))
+
+BUILTIN_TEMPLATES = {
+    'thank_you': ('Thank You for Your Visit!', THANK_YOU_HTML, THANK_YOU_TEXT),
+    'followup': ('How Are Your Nails Doing?', FOLLOWUP_HTML, FOLLOWUP_TEXT),
+}
+
+_templates: Dict[str, EmailTemplate] = {}
+
+def _load_template(name: str) -> EmailTemplate:
+    subject, html_source, text_source = BUILTIN_TEMPLATES[name]
+    
+    # Files in EMAIL_TEMPLATE_DIR override the built-in parts they provide:
+    # <name>.subject, <name>.html and <name>.txt
+    template_dir = Path(config.EMAIL_TEMPLATE_DIR)
+    overrides = {}
+    for suffix in ('subject', 'html', 'txt'):
+        path = template_dir / f'{name}.{suffix}'
+        if path.is_file():
+            overrides[suffix] = path.read_text(encoding='utf-8')
+    if overrides:
+        logger.info(f'Loaded {name} email template overrides from {template_dir}: {", ".join(sorted(overrides))}')
+    
+    return EmailTemplate(
+        name,
+        overrides.get('subject', subject).strip(),
+        overrides.get('html', html_source),
+        overrides.get('txt', text_source)
+    )
+
+def get_template(name: str) -> EmailTemplate:
+    """Return the compiled template, compiling it on first use"""
+    if name not in _templates:
+        if name not in BUILTIN_TEMPLATES:
+            raise ValueError(f'Unknown email template: {name}')
+        _templates[name] = _load_template(name)
+    return _templates[name]
+
+def reload_templates():
+    """Drop compiled templates so file changes are picked up"""
+    _templates.clear()
+
+def get_thank_you_email(customer_name: str, service_type: str = None) -> dict:
+    return get_template('thank_you').render(
+        customer_name=customer_name,
+        service_text=service_type or 'nail service'
+    )
+
+def get_followup_email(customer_name: str) -> dict:
+    return get_template('followup').render(customer_name=customer_name)
@@ -1,4 +1,5 @@
 from src.database.db import init_database
+from src.utils.config import config
 from src.utils.logger import logger
 from src.scheduler.scheduler import start_scheduler
 
@@ -7,8 +8,14 @@ def main():
         init_database()
         logger.info('Fresha Email Automation started')
         logger.info('Schedulers running:')
-        logger.info('  - Thank-you emails: 12pm and 7pm daily')
+        if config.THANK_YOU_SCHEDULE == 'fixed':
+            logger.info('  - Thank-you emails: 12pm and 7pm daily')
+        else:
+            logger.info(f'  - Thank-you emails: {config.THANK_YOU_DELAY_MINUTES} minutes after each appointment starts')
         logger.info('  - Follow-up emails: 10am daily')
+        if config.FRESHA_EMAIL:
+            logger.info('  - Fresha appointment sync: every few minutes, less often when quiet')
+        logger.info('  - Outbox delivery and retries: every few minutes')
         start_scheduler()
     except Exception as error:
         logger.error(f'Failed to start application: {error}')
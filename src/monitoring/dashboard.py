@@ -44,8 +44,6 @@ class DashboardHandler(BaseHTTPRequestHandler):
         cursor.execute('SELECT COUNT(*) FROM email_logs WHERE sent_at > datetime("now", "-24 hours")')
         recent_emails = cursor.fetchone()[0]
         
-        conn.close()
-        
         return {
             'total_appointments': total_appointments,
             'emails_sent': emails_sent,
@@ -68,7 +66,7 @@ class DashboardHandler(BaseHTTPRequestHandler):
     <meta name="viewport" content="width=device-width, initial-scale=1">
     <style>
         * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; background: #f5f5f5; padding: 20px; }
+        body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; background: #f5f5f5; padding: 20px; }}
         .container {{ max-width: 1200px; margin: 0 auto; }}
         h1 {{ color: #333; margin-bottom: 30px; }}
         .grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 20px; margin-bottom: 20px; }}
@@ -84,7 +82,7 @@ class DashboardHandler(BaseHTTPRequestHandler):
         .refresh-btn:hover {{ background: #0056b3; }}
     </style>
     <script>
-        function refresh() { location.reload(); }
+        function refresh() {{ location.reload(); }}
         setInterval(refresh, 60000); // Auto-refresh every minute
     </script>
 </head>
@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 from src.database.db import get_connection
+from src.database.models import get_recent_job_runs
 from src.utils.logger import logger
+from src.utils.dates import day_bounds, local_date
 
 class MetricsCollector:
     """Collect and report system metrics"""
@@ -24,7 +26,6 @@ class MetricsCollector:
         ''', (since,))
         
         results = cursor.fetchall()
-        conn.close()
         
         stats = {
             'total': 0,
@@ -53,26 +54,42 @@ class MetricsCollector:
         cursor.execute('SELECT COUNT(*) FROM appointments')
         total = cursor.fetchone()[0]
         
+        today_start, today_end = day_bounds(local_date())
         cursor.execute('''
             SELECT COUNT(*) FROM appointments 
-            WHERE DATE(appointment_date) = DATE('now')
-        ''')
+            WHERE appointment_at >= ? AND appointment_at < ?
+        ''', (today_start, today_end))
         today = cursor.fetchone()[0]
         
+        week_start, _ = day_bounds(local_date(days_ago=7))
         cursor.execute('''
             SELECT COUNT(*) FROM appointments 
-            WHERE DATE(appointment_date) >= DATE('now', '-7 days')
-        ''')
+            WHERE appointment_at >= ?
+        ''', (week_start,))
         week = cursor.fetchone()[0]
         
-        conn.close()
-        
         return {
             'total': total,
             'today': today,
             'last_7_days': week
         }
     
+    @staticmethod
+    def get_job_runs(limit: int = 10) -> list:
+        """Get per-run sent/skipped/failed summaries for the most recent jobs"""
+        return [
+            {
+                'job_name': run.job_name,
+                'started_at': run.started_at,
+                'finished_at': run.finished_at,
+                'status': run.status,
+                'sent': run.sent,
+                'skipped': run.skipped,
+                'failed': run.failed
+            }
+            for run in get_recent_job_runs(limit)
+        ]
+    
     @staticmethod
     def get_success_rate(hours: int = 24) -> float:
         """Calculate email success rate"""
@@ -90,5 +107,6 @@ class MetricsCollector:
             'email_stats_7d': MetricsCollector.get_email_stats(168),
             'appointment_stats': MetricsCollector.get_appointment_stats(),
             'success_rate_24h': MetricsCollector.get_success_rate(24),
-            'success_rate_7d': MetricsCollector.get_success_rate(168)
+            'success_rate_7d': MetricsCollector.get_success_rate(168),
+            'recent_job_runs': MetricsCollector.get_job_runs()
         }
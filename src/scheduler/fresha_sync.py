@@ -0,0 +1,116 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from apscheduler.triggers.date import DateTrigger
+from src.database.job_locks import acquire_job_lock, release_job_lock
+from src.scraper.fresha_scraper import FreshaScraper
+from src.utils.circuit_breaker import CircuitOpenError
+from src.utils.config import config
+from src.utils.dates import business_hours, salon_timezone
+from src.utils.logger import logger
+
+class FreshaSync:
+    """Imports Fresha appointments on an adaptive polling interval.
+    
+    One logged-in browser session is kept open between polls, and only
+    appointments that are new or changed since the previous poll are saved.
+    The interval drops to FRESHA_SYNC_MIN_MINUTES whenever a poll finds
+    changes and doubles after each quiet poll, up to a ceiling that is lower
+    during FRESHA_BUSINESS_HOURS. Each poll arms the next one as a date job.
+    
+    Playwright's sync API must stay on the thread that started it, so the
+    job needs an executor with a single thread.
+    """
+    
+    JOB_ID = 'fresha_sync'
+    
+    def __init__(self, scheduler, executor: str = 'default', scraper: FreshaScraper = None):
+        self.scheduler = scheduler
+        self.executor = executor
+        self.scraper = scraper or FreshaScraper()
+        self.interval = config.FRESHA_SYNC_MIN_MINUTES
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        # fresha_id -> scraped values of the appointments on the page at the last poll
+        self._seen = {}
+        self._logged_in = False
+        self.business_hours = business_hours()
+    
+    def _ceiling(self, now: datetime) -> int:
+        start, end = self.business_hours
+        if start <= now.hour < end:
+            return config.FRESHA_SYNC_BUSINESS_MAX_MINUTES
+        return config.FRESHA_SYNC_MAX_MINUTES
+    
+    def arm(self, delay_minutes: float = 0):
+        """Schedule the next poll delay_minutes from now"""
+        run_at = datetime.now(salon_timezone()) + timedelta(minutes=delay_minutes)
+        self.scheduler.add_job(
+            self.poll,
+            DateTrigger(run_date=run_at),
+            id=self.JOB_ID,
+            name='Fresha appointment sync',
+            executor=self.executor,
+            misfire_grace_time=None,
+            replace_existing=True
+        )
+    
+    def _close_session(self):
+        try:
+            self.scraper.close()
+        except Exception as error:
+            logger.warning(f'Error closing Fresha browser: {error}')
+        self._logged_in = False
+    
+    def sync(self) -> int:
+        """Scrape once and save new or changed appointments; returns how many"""
+        if not self._logged_in:
+            if self.scraper.page is None:
+                self.scraper.initialize()
+            self.scraper.login()
+            self._logged_in = True
+        
+        scraped, changed = {}, {}
+        for appointment in self.scraper.scrape_appointments():
+            values = (appointment.customer_name, appointment.customer_email,
+                      appointment.appointment_date, appointment.service_type)
+            scraped[appointment.fresha_id] = values
+            if self._seen.get(appointment.fresha_id) != values:
+                changed[appointment.fresha_id] = appointment
+        
+        if changed:
+            self.scraper.save_appointments(list(changed.values()))
+        # Only what this poll saw: appointments that have dropped off the page
+        # are not compared again, so the map stays the size of one scrape
+        self._seen = scraped
+        return len(changed)
+    
+    def poll(self):
+        """Run one sync and arm the next poll"""
+        now = datetime.now(salon_timezone())
+        ceiling = self._ceiling(now)
+        try:
+            if not acquire_job_lock(self.JOB_ID, self.owner, config.SCHEDULER_JOB_LOCK_SECONDS):
+                logger.info('Fresha sync is running in another process, skipping this poll')
+                return
+            try:
+                changed = self.sync()
+            finally:
+                release_job_lock(self.JOB_ID, self.owner, now.timestamp())
+            
+            if changed:
+                self.interval = config.FRESHA_SYNC_MIN_MINUTES
+            else:
+                self.interval = min(self.interval * 2, ceiling)
+            logger.info(f'Fresha sync: {changed} new or changed appointments, next poll in {self.interval} minutes')
+        except CircuitOpenError as error:
+            self.interval = ceiling
+            logger.warning(f'Fresha sync skipped: {error}')
+        except Exception as error:
+            # Start from a fresh browser and login next time
+            self._close_session()
+            self.interval = ceiling
+            logger.error(f'Fresha sync failed: {error}')
+        finally:
+            # Never slower than the current ceiling, e.g. when business hours start
+            self.arm(min(self.interval, ceiling))
@@ -1,12 +1,133 @@
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
 from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor, ProcessPoolExecutor
 from apscheduler.triggers.cron import CronTrigger
-from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+from src.database.job_locks import acquire_job_lock, release_job_lock, get_last_run
 from src.utils.config import config
 from src.utils.logger import logger
 from src.utils.health_check import HealthCheck
 from src.utils.db_backup import backup_database
+from src.utils.dates import salon_timezone
 from src.scheduler.script1_thankyou import send_thank_you_emails
 from src.scheduler.script2_followup import send_followup_emails
+from src.scheduler.script3_outbox import deliver_outbox
+from src.scheduler.thank_you_dispatcher import ThankYouDispatcher
+from src.scheduler.fresha_sync import FreshaSync
+
+def _backup():
+    backup_database()
+
+def _health_check():
+    HealthCheck().get_full_health()
+
+def _thank_you_12pm(day: str = None):
+    send_thank_you_emails('12pm', day)
+
+def _thank_you_7pm(day: str = None):
+    send_thank_you_emails('7pm', day)
+
+# Jobs run through run_job. Functions are module-level so the process pool can
+# pickle them. Windows of catch_up jobs missed while no scheduler was running
+# are re-run on start; dated jobs are passed the local date of their window.
+JOBS = {
+    'daily_backup': {'func': _backup, 'executor': 'processpool', 'catch_up': True, 'dated': False},
+    'health_check': {'func': _health_check, 'executor': 'default', 'catch_up': False, 'dated': False},
+    'thank_you_12pm': {'func': _thank_you_12pm, 'executor': 'default', 'catch_up': True, 'dated': True},
+    'thank_you_7pm': {'func': _thank_you_7pm, 'executor': 'default', 'catch_up': True, 'dated': True},
+    'followup_7day': {'func': send_followup_emails, 'executor': 'default', 'catch_up': True, 'dated': True},
+    'email_outbox': {'func': deliver_outbox, 'executor': 'default', 'catch_up': False, 'dated': False},
+}
+
+# Scheduled catch-up job id -> (job_id, window), so a locked-out run can be retried
+_catch_up_runs = {}
+
+def run_job(job_id: str, scheduled_for: Optional[float] = None) -> bool:
+    """Run a registered job unless another scheduler process is already running it.
+    
+    scheduled_for is the epoch time of the window being run; catch-up runs
+    pass the missed window, regular runs default to now. Returns False if the
+    job was locked and did not run.
+    """
+    job = JOBS[job_id]
+    owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    if not acquire_job_lock(job_id, owner, config.SCHEDULER_JOB_LOCK_SECONDS):
+        logger.warning(f'Job {job_id} is already running in another process, skipping')
+        return False
+    
+    scheduled_for = scheduled_for or time.time()
+    try:
+        if job['dated']:
+            day = datetime.fromtimestamp(scheduled_for, salon_timezone()).date().isoformat()
+            job['func'](day)
+        else:
+            job['func']()
+    finally:
+        # Recorded even on failure: the failure was alerted on, and re-running
+        # the window on every restart would not help
+        release_job_lock(job_id, owner, scheduled_for)
+    return True
+
+def _add_catch_up(scheduler, job_id: str, window: datetime, run_at: datetime):
+    catch_up_id = f'{job_id}_catch_up_{int(window.timestamp())}'
+    _catch_up_runs[catch_up_id] = (job_id, window)
+    scheduler.add_job(
+        run_job,
+        DateTrigger(run_date=run_at),
+        args=[job_id, window.timestamp()],
+        id=catch_up_id,
+        name=f'Catch-up {job_id} for {window:%Y-%m-%d %H:%M}',
+        executor=JOBS[job_id]['executor'],
+        misfire_grace_time=None,
+        replace_existing=True
+    )
+
+def schedule_catch_up(scheduler, triggers: dict) -> int:
+    """Queue missed windows of catch_up jobs, oldest first; returns how many.
+    
+    Only the latest SCHEDULER_MAX_CATCH_UP windows of each job are re-run, one
+    every SCHEDULER_CATCH_UP_SPACING_SECONDS, so a long outage neither drops
+    everything nor starts every missed run at once.
+    """
+    now = datetime.now(scheduler.timezone)
+    run_at = now
+    queued = 0
+    for job_id, trigger in triggers.items():
+        if not JOBS[job_id]['catch_up']:
+            continue
+        # A job that has never run has nothing to catch up on
+        last_run = get_last_run(job_id)
+        if last_run is None:
+            continue
+        
+        missed = []
+        window = trigger.get_next_fire_time(None, datetime.fromtimestamp(last_run + 1, scheduler.timezone))
+        while window and window <= now:
+            missed.append(window)
+            window = trigger.get_next_fire_time(window, window + timedelta(seconds=1))
+        if not missed:
+            continue
+        
+        dropped = missed[:-config.SCHEDULER_MAX_CATCH_UP]
+        if dropped:
+            logger.warning(f'Job {job_id} missed {len(missed)} runs; skipping the oldest {len(dropped)} '
+                           f'({dropped[0]:%Y-%m-%d %H:%M} to {dropped[-1]:%Y-%m-%d %H:%M})')
+        for window in missed[-config.SCHEDULER_MAX_CATCH_UP:]:
+            _add_catch_up(scheduler, job_id, window, run_at)
+            run_at += timedelta(seconds=config.SCHEDULER_CATCH_UP_SPACING_SECONDS)
+            queued += 1
+        logger.info(f'Catching up {min(len(missed), config.SCHEDULER_MAX_CATCH_UP)} missed runs of {job_id}')
+    return queued
 
 def job_listener(event):
     """Listen to job execution events"""
@@ -16,56 +137,116 @@ def job_listener(event):
         logger.info(f'Job {event.job_id} completed successfully')
 
 def start_scheduler():
-    scheduler = BlockingScheduler(timezone=config.TIMEZONE)
+    scheduler = BlockingScheduler(
+        timezone=config.TIMEZONE,
+        executors={
+            'default': ThreadPoolExecutor(config.SCHEDULER_THREADS),
+            # The backup copies the whole database; keep it off the scheduler's threads
+            'processpool': ProcessPoolExecutor(
+                config.SCHEDULER_PROCESSES,
+                pool_kwargs={'mp_context': multiprocessing.get_context('spawn')}
+            ),
+            # Playwright's sync API is bound to one thread, so the Fresha sync gets its own
+            'scraper': ThreadPoolExecutor(1),
+        },
+        job_defaults={
+            'coalesce': True,
+            'max_instances': 1,
+            'misfire_grace_time': config.SCHEDULER_MISFIRE_GRACE_SECONDS,
+        }
+    )
+    triggers = {}
+    
+    def add_job(job_id: str, trigger, name: str):
+        triggers[job_id] = trigger
+        scheduler.add_job(
+            run_job,
+            trigger,
+            args=[job_id],
+            id=job_id,
+            name=name,
+            executor=JOBS[job_id]['executor']
+        )
+    
+    def catch_up_listener(event):
+        # A catch-up run that found its job locked, e.g. by the regular run, goes again later
+        if event.job_id in _catch_up_runs:
+            job_id, window = _catch_up_runs.pop(event.job_id)
+            if event.retval is False:
+                retry_at = datetime.now(scheduler.timezone) + timedelta(seconds=config.SCHEDULER_CATCH_UP_SPACING_SECONDS)
+                _add_catch_up(scheduler, job_id, window, retry_at)
     
-    # Add event listener
+    def missed_listener(event):
+        # Delayed past the grace time while the scheduler was up (e.g. a busy
+        # pool); run the window now rather than wait for a restart
+        if event.job_id in triggers and JOBS[event.job_id]['catch_up']:
+            logger.warning(f'Job {event.job_id} missed its {event.scheduled_run_time:%H:%M} run, catching up')
+            _add_catch_up(scheduler, event.job_id, event.scheduled_run_time, datetime.now(scheduler.timezone))
+        else:
+            logger.warning(f'Job {event.job_id} missed its {event.scheduled_run_time:%H:%M} run')
+    
+    # Add event listeners
     scheduler.add_listener(job_listener, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+    scheduler.add_listener(catch_up_listener, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+    scheduler.add_listener(missed_listener, EVENT_JOB_MISSED)
+    scheduler.add_listener(
+        lambda event: logger.warning(f'Job {event.job_id} is still running, skipping this run'),
+        EVENT_JOB_MAX_INSTANCES
+    )
     
     # Daily backup at 2am
-    scheduler.add_job(
-        lambda: backup_database(),
-        CronTrigger(hour=2, minute=0),
-        id='daily_backup',
-        name='Daily database backup'
-    )
+    add_job('daily_backup', CronTrigger(hour=2, minute=0, timezone=config.TIMEZONE), 'Daily database backup')
     
     # Health check every 6 hours
-    scheduler.add_job(
-        lambda: HealthCheck().get_full_health(),
-        CronTrigger(hour='*/6', minute=0),
-        id='health_check',
-        name='System health check'
-    )
+    add_job('health_check', CronTrigger(hour='*/6', minute=0, timezone=config.TIMEZONE), 'System health check')
     
     # Thank-you emails
-    scheduler.add_job(
-        lambda: send_thank_you_emails('12pm'),
-        CronTrigger(hour=12, minute=0),
-        id='thank_you_12pm',
-        name='Thank-you emails at 12pm'
-    )
-    
-    scheduler.add_job(
-        lambda: send_thank_you_emails('7pm'),
-        CronTrigger(hour=19, minute=0),
-        id='thank_you_7pm',
-        name='Thank-you emails at 7pm'
-    )
+    if config.THANK_YOU_SCHEDULE == 'fixed':
+        add_job('thank_you_12pm', CronTrigger(hour=12, minute=0, timezone=config.TIMEZONE), 'Thank-you emails at 12pm')
+        add_job('thank_you_7pm', CronTrigger(hour=19, minute=0, timezone=config.TIMEZONE), 'Thank-you emails at 7pm')
+        thank_you_schedule = '12pm and 7pm daily'
+    else:
+        # Picks up new appointments, starting right away; the dispatcher
+        # schedules its own sends as they come due
+        dispatcher = ThankYouDispatcher(scheduler)
+        scheduler.add_job(
+            dispatcher.refresh,
+            IntervalTrigger(minutes=config.THANK_YOU_REFRESH_MINUTES),
+            id='thank_you_refresh',
+            name='Queue thank-you emails for new appointments',
+            next_run_time=datetime.now(scheduler.timezone)
+        )
+        thank_you_schedule = f'{config.THANK_YOU_DELAY_MINUTES} minutes after each appointment starts'
     
     # Follow-up emails
-    scheduler.add_job(
-        send_followup_emails,
-        CronTrigger(hour=10, minute=0),
-        id='followup_7day',
-        name='7-day follow-up emails'
-    )
+    add_job('followup_7day', CronTrigger(hour=10, minute=0, timezone=config.TIMEZONE), '7-day follow-up emails')
+    
+    # Outbox: retries and messages left behind by interrupted runs
+    add_job('email_outbox', IntervalTrigger(minutes=config.EMAIL_OUTBOX_INTERVAL_MINUTES), 'Outbox delivery')
+    
+    # Fresha sync, starting right away and then on an adaptive interval
+    if config.FRESHA_EMAIL:
+        FreshaSync(scheduler, executor='scraper').arm()
+        sync_schedule = (f'every {config.FRESHA_SYNC_MIN_MINUTES} to {config.FRESHA_SYNC_BUSINESS_MAX_MINUTES} minutes '
+                         f'during business hours, up to {config.FRESHA_SYNC_MAX_MINUTES} minutes otherwise')
+    else:
+        sync_schedule = 'disabled, FRESHA_EMAIL is not set'
+    
+    catch_up = schedule_catch_up(scheduler, triggers)
     
     logger.info('Scheduler started')
-    logger.info('Thank-you emails scheduled: 12pm and 7pm daily')
+    logger.info(f'Thank-you emails scheduled: {thank_you_schedule}')
     logger.info('Follow-up emails scheduled: 10am daily')
+    logger.info(f'Outbox delivery scheduled: every {config.EMAIL_OUTBOX_INTERVAL_MINUTES} minutes')
+    logger.info(f'Fresha sync scheduled: {sync_schedule}')
     logger.info('Daily backup scheduled: 2am')
     logger.info('Health checks scheduled: every 6 hours')
+    if catch_up:
+        logger.info(f'Missed runs queued for catch-up: {catch_up}')
     
+    # `docker stop` and service managers send SIGTERM; stop the same way as on
+    # Ctrl-C so running jobs finish and exit handlers flush buffered email logs
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     try:
         scheduler.start()
     except (KeyboardInterrupt, SystemExit):
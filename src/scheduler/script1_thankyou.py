@@ -1,104 +1,63 @@
 import sys
-from datetime import datetime
 from src.database.db import init_database
-from src.database.models import get_appointments_by_date, get_email_tracking, update_email_tracking, log_email, EmailTracking
+from src.database.models import (
+    get_due_appointments, count_handled_appointments, email_log_writer,
+    start_job_run, finish_job_run
+)
+from src.database.outbox import enqueue_emails
 from src.email.email_service import EmailService
+from src.email.outbox_worker import OutboxWorker
 from src.alerts.alert_service import AlertService
 from src.utils.logger import logger
+from src.utils.dates import local_date
 
 email_service = EmailService()
 alert_service = AlertService()
+outbox_worker = OutboxWorker(email_service, alert_service)
 
-def send_thank_you_emails(time_slot: str):
+def send_thank_you_emails(time_slot: str, day: str = None):
+    """Send the time slot's thank-you emails for day (default today)"""
+    run = None
     try:
         init_database()
         
-        today = datetime.now().strftime('%Y-%m-%d')
-        appointments = get_appointments_by_date(today)
+        today = day or local_date()
+        email_type = f'thank_you_{time_slot}'
+        run = start_job_run(email_type)
+        appointments = get_due_appointments(email_type, today)
+        run.skipped = count_handled_appointments(email_type, today)
         
-        logger.info(f'Processing {len(appointments)} appointments for {time_slot} thank-you emails')
-        
-        sent = 0
-        skipped = 0
-        failed = 0
-        
-        for appointment in appointments:
-            try:
-                if not appointment.id:
-                    logger.warn(f'Appointment missing ID, skipping', extra={'freshaId': appointment.fresha_id})
-                    skipped += 1
-                    continue
-                
-                tracking = get_email_tracking(appointment.id)
-                already_sent = False
-                
-                if time_slot == '12pm':
-                    already_sent = tracking.thank_you_sent_12pm if tracking else False
-                else:
-                    already_sent = tracking.thank_you_sent_7pm if tracking else False
-                
-                if already_sent:
-                    logger.info(f'Thank-you email already sent for {appointment.customer_email} at {time_slot}')
-                    skipped += 1
-                    log_email(
-                        appointment.id,
-                        f'thank_you_{time_slot}',
-                        'skipped',
-                        'Already sent'
-                    )
-                    continue
-                
-                email_service.send_thank_you_email(
+        queued = enqueue_emails([
+            (
+                appointment,
+                email_type,
+                email_service.build_email(
+                    email_type,
                     appointment.customer_email,
                     appointment.customer_name,
                     appointment.service_type
                 )
-                
-                if not tracking:
-                    tracking = EmailTracking(appointment_id=appointment.id)
-                
-                if time_slot == '12pm':
-                    tracking.thank_you_sent_12pm = True
-                else:
-                    tracking.thank_you_sent_7pm = True
-                
-                update_email_tracking(tracking)
-                
-                log_email(
-                    appointment.id,
-                    f'thank_you_{time_slot}',
-                    'sent',
-                    None
-                )
-                
-                sent += 1
-                logger.info(f'Thank-you email sent to {appointment.customer_email} at {time_slot}')
-            except Exception as error:
-                failed += 1
-                error_message = str(error)
-                logger.error(f'Failed to send thank-you email to {appointment.customer_email}', extra={'error': error_message})
-                
-                log_email(
-                    appointment.id,
-                    f'thank_you_{time_slot}',
-                    'failed',
-                    error_message
-                )
-                
-                alert_service.handle_failure('Thank-You Email', error, {
-                    'appointmentId': appointment.id,
-                    'customerEmail': appointment.customer_email,
-                    'timeSlot': time_slot
-                })
+            )
+            for appointment in appointments
+        ])
+        
+        logger.info(f'Queued {queued} {time_slot} thank-you emails ({run.skipped} already sent)')
+        
+        outbox_worker.run(run, email_type)
         
-        logger.info(f'Thank-you email job completed ({time_slot}): {sent} sent, {skipped} skipped, {failed} failed')
+        logger.info(f'Thank-you email job completed ({time_slot}): {run.sent} sent, {run.skipped} skipped, {run.failed} failed')
+        finish_job_run(run, 'completed')
         
-        if sent > 0 or skipped > 0:
+        if run.sent > 0 or run.failed == 0:
             alert_service.handle_success()
     except Exception as error:
         logger.error('Thank-you email job failed', extra={'error': str(error)})
         alert_service.handle_failure('Thank-You Email Job', error)
+        if run:
+            finish_job_run(run, 'failed')
         raise
+    finally:
+        email_log_writer.flush()
 
 if __name__ == '__main__':
     time_slot = sys.argv[1] if len(sys.argv) > 1 else '12pm'
@@ -1,93 +1,61 @@
 import sys
 from src.database.db import init_database
-from src.database.models import get_appointments_7_days_ago, get_email_tracking, update_email_tracking, log_email, EmailTracking
+from src.database.models import (
+    get_due_appointments, count_handled_appointments, email_log_writer,
+    start_job_run, finish_job_run
+)
+from src.database.outbox import enqueue_emails
 from src.email.email_service import EmailService
+from src.email.outbox_worker import OutboxWorker
 from src.alerts.alert_service import AlertService
 from src.utils.logger import logger
-from datetime import datetime
+from src.utils.dates import local_date, days_before
 
 email_service = EmailService()
 alert_service = AlertService()
+outbox_worker = OutboxWorker(email_service, alert_service)
 
-def send_followup_emails():
+def send_followup_emails(day: str = None):
+    """Send follow-ups for appointments seven days before day (default today)"""
+    run = None
     try:
         init_database()
         
-        appointments = get_appointments_7_days_ago()
+        seven_days_ago = days_before(day, 7) if day else local_date(days_ago=7)
+        run = start_job_run('followup_7day')
+        appointments = get_due_appointments('followup_7day', seven_days_ago)
+        run.skipped = count_handled_appointments('followup_7day', seven_days_ago)
         
-        logger.info(f'Processing {len(appointments)} appointments for 7-day follow-up emails')
-        
-        sent = 0
-        skipped = 0
-        failed = 0
-        
-        for appointment in appointments:
-            try:
-                if not appointment.id:
-                    logger.warn(f'Appointment missing ID, skipping', extra={'freshaId': appointment.fresha_id})
-                    skipped += 1
-                    continue
-                
-                tracking = get_email_tracking(appointment.id)
-                
-                if tracking and tracking.followup_sent:
-                    logger.info(f'Follow-up email already sent for {appointment.customer_email}')
-                    skipped += 1
-                    log_email(
-                        appointment.id,
-                        'followup_7day',
-                        'skipped',
-                        'Already sent (duplicate prevention)'
-                    )
-                    continue
-                
-                email_service.send_followup_email(
+        queued = enqueue_emails([
+            (
+                appointment,
+                'followup_7day',
+                email_service.build_email(
+                    'followup_7day',
                     appointment.customer_email,
                     appointment.customer_name
                 )
-                
-                if not tracking:
-                    tracking = EmailTracking(appointment_id=appointment.id)
-                
-                tracking.followup_sent = True
-                tracking.followup_sent_date = datetime.now().isoformat()
-                
-                update_email_tracking(tracking)
-                
-                log_email(
-                    appointment.id,
-                    'followup_7day',
-                    'sent',
-                    None
-                )
-                
-                sent += 1
-                logger.info(f'Follow-up email sent to {appointment.customer_email}')
-            except Exception as error:
-                failed += 1
-                error_message = str(error)
-                logger.error(f'Failed to send follow-up email to {appointment.customer_email}', extra={'error': error_message})
-                
-                log_email(
-                    appointment.id,
-                    'followup_7day',
-                    'failed',
-                    error_message
-                )
-                
-                alert_service.handle_failure('Follow-Up Email', error, {
-                    'appointmentId': appointment.id,
-                    'customerEmail': appointment.customer_email
-                })
+            )
+            for appointment in appointments
+        ])
+        
+        logger.info(f'Queued {queued} 7-day follow-up emails ({run.skipped} already sent)')
+        
+        outbox_worker.run(run, 'followup_7day')
         
-        logger.info(f'Follow-up email job completed: {sent} sent, {skipped} skipped, {failed} failed')
+        logger.info(f'Follow-up email job completed: {run.sent} sent, {run.skipped} skipped, {run.failed} failed')
+        finish_job_run(run, 'completed')
         
-        if sent > 0 or skipped > 0:
+        if run.sent > 0 or run.failed == 0:
             alert_service.handle_success()
     except Exception as error:
         logger.error('Follow-up email job failed', extra={'error': str(error)})
         alert_service.handle_failure('Follow-Up Email Job', error)
+        if run:
+            finish_job_run(run, 'failed')
         raise
+    finally:
+        email_log_writer.flush()
 
 if __name__ == '__main__':
     logger.info('Starting 7-day follow-up email script')
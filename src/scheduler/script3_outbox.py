@@ -0,0 +1,86 @@
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from src.database.db import init_database
+from src.database.models import email_log_writer, start_job_run, finish_job_run
+from src.email.email_service import set_send_quota_share
+from src.email.outbox_worker import OutboxWorker
+from src.alerts.alert_service import AlertService
+from src.utils.logger import logger
+
+alert_service = AlertService()
+outbox_worker = OutboxWorker(alert_service=alert_service)
+
+def deliver_outbox(shard: Optional[Tuple[int, int]] = None, email_type: Optional[str] = None) -> dict:
+    """Send every due outbox message: retries, and sends left by a crashed or overlapping run.
+    
+    With shard=(index, count) only appointments in that shard are handled,
+    and this process keeps to 1/count of the send quota so count shards on
+    separate hosts together stay within the account limits. Returns the
+    run's sent/skipped/failed counts.
+    """
+    if shard:
+        set_send_quota_share(shard[1])
+    run = None
+    worker = OutboxWorker(alert_service=alert_service, shard=shard) if shard else outbox_worker
+    job_name = f'outbox {shard[0]}/{shard[1]}' if shard else 'outbox'
+    try:
+        init_database()
+        
+        run = start_job_run(job_name)
+        worker.run(run, email_type)
+        
+        logger.info(f'Outbox delivery completed ({job_name}): {run.sent} sent, {run.failed} failed')
+        finish_job_run(run, 'completed')
+        
+        if run.sent > 0 and run.failed == 0:
+            alert_service.handle_success()
+        return {'sent': run.sent, 'skipped': run.skipped, 'failed': run.failed}
+    except Exception as error:
+        logger.error('Outbox delivery failed', extra={'error': str(error)})
+        alert_service.handle_failure('Outbox Delivery Job', error)
+        if run:
+            finish_job_run(run, 'failed')
+        raise
+    finally:
+        email_log_writer.flush()
+
+def _deliver_shard(index: int, count: int, email_type: Optional[str]) -> dict:
+    # Runs in a child process: its own SMTP pool, and deliver_outbox sets its
+    # share of the send quota
+    return deliver_outbox((index, count), email_type)
+
+def deliver_outbox_sharded(processes: int, email_type: Optional[str] = None) -> dict:
+    """Drain the outbox with one process per shard and return the summed counts"""
+    init_database()
+    totals = {'sent': 0, 'skipped': 0, 'failed': 0}
+    # spawn, not fork: children must not inherit the parent's SQLite and SMTP connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        futures = [executor.submit(_deliver_shard, index, processes, email_type) for index in range(processes)]
+        errors = []
+        for future in futures:
+            try:
+                counts = future.result()
+            except Exception as error:
+                errors.append(error)
+                continue
+            for key in totals:
+                totals[key] += counts[key]
+    
+    logger.info(f'Sharded outbox delivery completed ({processes} processes): '
+                f'{totals["sent"]} sent, {totals["skipped"]} skipped, {totals["failed"]} failed')
+    if errors:
+        raise RuntimeError(f'{len(errors)} of {processes} sender processes failed: {errors[0]}')
+    return totals
+
+if __name__ == '__main__':
+    logger.info('Starting outbox delivery script')
+    try:
+        deliver_outbox()
+        logger.info('Script completed successfully')
+        sys.exit(0)
+    except Exception as error:
+        logger.error('Script failed', extra={'error': str(error)})
+        sys.exit(1)
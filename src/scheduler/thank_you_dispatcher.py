@@ -0,0 +1,162 @@
+import heapq
+import time
+from datetime import datetime
+from threading import Lock
+from apscheduler.triggers.date import DateTrigger
+from src.database.models import (
+    get_thank_you_candidates, get_thank_you_candidates_by_id, email_log_writer,
+    start_job_run, finish_job_run
+)
+from src.database.outbox import enqueue_emails
+from src.email.email_service import EmailService
+from src.email.outbox_worker import OutboxWorker
+from src.alerts.alert_service import AlertService
+from src.utils.config import config
+from src.utils.dates import business_hours, closing_time, salon_timezone
+from src.utils.logger import logger
+
+class ThankYouDispatcher:
+    """Sends each thank-you email when its appointment comes due.
+    
+    Appointments are kept in a heap keyed by appointment start plus
+    THANK_YOU_DELAY_MINUTES, and a single APScheduler date job is armed for
+    the earliest one. An appointment known only by its day has no start to
+    go by, so it is due at closing time (end of FRESHA_BUSINESS_HOURS). refresh() only reads appointments added or changed
+    since the last read, so the day is never rescanned; an appointment that
+    was rescheduled gets a new heap entry and its old one is skipped.
+    """
+    
+    JOB_ID = 'thank_you_dispatch'
+    
+    def __init__(self, scheduler, email_service: EmailService = None, alert_service: AlertService = None):
+        self.scheduler = scheduler
+        self.delay = config.THANK_YOU_DELAY_MINUTES * 60
+        # Longest time from appointment_at to due time: the delay, or local
+        # midnight to closing time for day-only appointments
+        self.lead = max(self.delay, business_hours()[1] * 3600)
+        self.email_service = email_service or EmailService()
+        self.alert_service = alert_service or AlertService()
+        self.outbox_worker = OutboxWorker(self.email_service, self.alert_service)
+        self._heap = []
+        # Current due time of each queued appointment; heap entries that differ are stale
+        self._due = {}
+        self._last_id = 0
+        self._changed_since = 0
+        self._armed_at = None
+        self._lock = Lock()
+    
+    def _due_at(self, appointment) -> float:
+        if appointment.has_start_time:
+            return appointment.appointment_at + self.delay
+        # appointment_at is the day's midnight; never send before the salon closes
+        return closing_time(appointment.appointment_at)
+    
+    def _push(self, appointment_id: int, due_at: float):
+        if self._due.get(appointment_id) != due_at:
+            self._due[appointment_id] = due_at
+            heapq.heappush(self._heap, (due_at, appointment_id))
+    
+    def _arm(self):
+        """Make sure a dispatch job is scheduled for the earliest due appointment"""
+        if not self._heap:
+            return
+        due_at = max(self._heap[0][0], time.time())
+        if self._armed_at is not None and self._armed_at <= due_at:
+            return
+        self._armed_at = due_at
+        # A fresh id per arming, so a job that is still finishing never replaces the new one
+        self.scheduler.add_job(
+            self.dispatch_due,
+            DateTrigger(run_date=datetime.fromtimestamp(due_at, salon_timezone())),
+            id=f'{self.JOB_ID}_{int(due_at * 1000)}',
+            name='Thank-you emails as appointments come due',
+            misfire_grace_time=None,
+            replace_existing=True
+        )
+    
+    def refresh(self) -> int:
+        """Queue appointments added or changed since the last refresh; returns how many"""
+        started = int(time.time())
+        # Anything older was due long enough ago to have been handled by an
+        # earlier run, even across a restart
+        since = started - self.lead - config.THANK_YOU_LOOKBACK_HOURS * 3600
+        appointments = get_thank_you_candidates(since, self._last_id, self._changed_since)
+        with self._lock:
+            # Second resolution: changes made later this second are read again next time
+            self._changed_since = started
+            for appointment in appointments:
+                self._last_id = max(self._last_id, appointment.id)
+                self._push(appointment.id, self._due_at(appointment))
+            self._arm()
+        if appointments:
+            logger.info(f'Queued {len(appointments)} thank-you emails, {len(self._due)} pending')
+        return len(appointments)
+    
+    def dispatch_due(self):
+        """Send the thank-you emails that are due and re-arm for the next one"""
+        now = time.time()
+        with self._lock:
+            self._armed_at = None
+            due_ids = []
+            while self._heap and self._heap[0][0] <= now:
+                due_at, appointment_id = heapq.heappop(self._heap)
+                if self._due.get(appointment_id) != due_at:
+                    continue
+                del self._due[appointment_id]
+                due_ids.append(appointment_id)
+        
+        try:
+            if due_ids:
+                self._send(due_ids, now)
+        finally:
+            with self._lock:
+                self._arm()
+    
+    def _send(self, due_ids: list, now: float):
+        # Re-read the appointments: some may have been rescheduled, lost or
+        # gained their start time, or been handled elsewhere
+        due, moved = [], []
+        for appointment in get_thank_you_candidates_by_id(due_ids):
+            if self._due_at(appointment) > now:
+                moved.append(appointment)
+            else:
+                due.append(appointment)
+        with self._lock:
+            for appointment in moved:
+                self._push(appointment.id, self._due_at(appointment))
+        if not due:
+            return
+        
+        run = start_job_run('thank_you')
+        try:
+            enqueue_emails([
+                (
+                    appointment,
+                    'thank_you',
+                    self.email_service.build_email(
+                        'thank_you',
+                        appointment.customer_email,
+                        appointment.customer_name,
+                        appointment.service_type
+                    )
+                )
+                for appointment in due
+            ])
+            self.outbox_worker.run(run, 'thank_you')
+            
+            logger.info(f'Thank-you emails dispatched: {run.sent} sent, {run.failed} failed')
+            finish_job_run(run, 'completed')
+            
+            if run.sent > 0 or run.failed == 0:
+                self.alert_service.handle_success()
+        except Exception as error:
+            logger.error('Thank-you dispatch failed', extra={'error': str(error)})
+            # Try again shortly; anything that did reach the outbox is filtered out then
+            with self._lock:
+                for appointment in due:
+                    self._push(appointment.id, now + 60)
+            self.alert_service.handle_failure('Thank-You Email Job', error)
+            finish_job_run(run, 'failed')
+            raise
+        finally:
+            email_log_writer.flush()
@@ -0,0 +1,321 @@
+import asyncio
+import time
+from typing import Callable, List, Optional
+from urllib.parse import urlsplit
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, TimeoutError as PlaywrightTimeoutError
+from src.utils.config import config
+from src.utils.logger import logger
+from src.database.db import init_database
+from src.database.models import save_appointments, Appointment
+from src.utils.circuit_breaker import CircuitBreaker
+from src.scraper import browser_session
+from src.scraper.browser_session import SessionExpiredError, fresha_breaker, run_async
+from src.scraper.dom_parser import APPOINTMENT_SELECTOR, EXTRACT_ROWS_JS
+from src.scraper.paging import (
+    MORE_ROWS_JS, SCROLL_TO_END_JS, PageState, day_url, days, is_api_response, parse_payloads
+)
+from src.scraper.request_policy import RequestPolicy
+
+def configured_locations() -> List[str]:
+    return [location.strip() for location in config.FRESHA_LOCATIONS.split(',') if location.strip()]
+
+class HostPacer:
+    """Spaces out the requests all pages send to each host.
+    
+    Each caller reserves the next free slot for its host and sleeps until
+    then, so slots are handed out in call order without a lock.
+    """
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot = {}
+    
+    async def wait(self, url: str):
+        host = urlsplit(url).hostname or ''
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class AsyncFreshaScraper:
+    """Scrapes many location/day windows at once on playwright.async_api.
+    
+    One browser and one logged-in context are shared by up to `concurrency`
+    pages, each taking the next (location, day) window from a queue until
+    none are left. Page loads and next-page requests from all pages are
+    paced request_interval seconds apart per host, so more pages overlap
+    Fresha's response times rather than sending it more requests per second.
+    """
+    
+    def __init__(self, concurrency: int = None, request_interval: float = None,
+                 breaker: CircuitBreaker = None, request_policy: RequestPolicy = None):
+        self.concurrency = max(concurrency or config.FRESHA_SCRAPE_CONCURRENCY, 1)
+        self.pacer = HostPacer(config.FRESHA_REQUEST_INTERVAL_SECONDS if request_interval is None else request_interval)
+        self.breaker = breaker or fresha_breaker
+        self.request_policy = request_policy or RequestPolicy.from_config()
+        self.browser: Browser = None
+        self.context: BrowserContext = None
+        self.playwright = None
+        self._login_lock = None
+        self._logins = 0
+    
+    async def initialize(self):
+        init_database()
+        self._login_lock = asyncio.Lock()
+        self.playwright = await async_playwright().start()
+        self.browser = await run_async(browser_session.open_browser(self.playwright))
+        self.context = await self._new_context()
+        logger.info(f'Browser initialized for {self.concurrency} concurrent pages')
+    
+    async def _new_context(self) -> BrowserContext:
+        route_handler = self.request_policy.handle_async if self.request_policy.enabled else None
+        return await run_async(browser_session.new_context(self.browser, route_handler))
+    
+    async def _call(self, func: Callable, *args):
+        """breaker.call for coroutines"""
+        # A half-open breaker blocks other callers until its trial call ends;
+        # wait for that in a thread so the trial can finish on this loop
+        await asyncio.to_thread(self.breaker.before_call)
+        try:
+            result = await func(*args)
+        except Exception as error:
+            if self.breaker.is_failure(error):
+                self.breaker.record_failure(error)
+            else:
+                self.breaker.record_ignored()
+            raise
+        self.breaker.record_success()
+        return result
+    
+    async def login(self):
+        if not self.context:
+            raise Exception('Browser not initialized')
+        await self._call(self._login)
+    
+    async def _login(self):
+        page = await self.context.new_page()
+        try:
+            if await run_async(browser_session.login(page, self.context)):
+                self._logins += 1
+        finally:
+            await page.close()
+    
+    async def _on_login_page(self, page: Page) -> bool:
+        return await run_async(browser_session.on_login_page(page))
+    
+    async def _save_session(self):
+        await run_async(browser_session.save_session(self.context))
+    
+    def clear_session(self):
+        browser_session.clear_session()
+    
+    async def _full_login(self, page: Page):
+        await run_async(browser_session.full_login(page, self.context))
+        self._logins += 1
+    
+    async def _relogin(self, logins: int):
+        async with self._login_lock:
+            # Pages that hit the expiry together log in once; the cookies are
+            # shared by every page in the context
+            if self._logins != logins:
+                return
+            logger.info('Fresha session expired, logging in again')
+            self.clear_session()
+            page = await self.context.new_page()
+            try:
+                await self._full_login(page)
+            finally:
+                await page.close()
+    
+    async def scrape(self, start: str, end: str = None, locations: List[str] = None,
+                     on_batch: Callable[[List[Appointment]], object] = None) -> dict:
+        """Scrape every day from start to end for each location, several pages at once.
+        
+        Locations default to FRESHA_LOCATIONS; with none, FRESHA_DAY_URL is
+        read for each day. on_batch runs in a worker thread for each batch of
+        new appointments. A window that fails is logged and counted, and the
+        rest carry on. Returns the window, failure and appointment counts and
+        the wall-clock seconds taken.
+        """
+        if not self.context:
+            raise Exception('Browser not initialized')
+        
+        locations = locations or configured_locations() or [None]
+        scrape_days = list(days(start, end))
+        queue = asyncio.Queue()
+        for location in locations:
+            for day in scrape_days:
+                queue.put_nowait((location, day))
+        stats = {
+            'locations': len(locations), 'days': len(scrape_days), 'windows': queue.qsize(),
+            'failed': 0, 'appointments': 0, 'pages': min(self.concurrency, queue.qsize()),
+        }
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(self._worker(queue, on_batch, stats) for _ in range(stats['pages'])))
+        stats['seconds'] = time.perf_counter() - started
+        # Keep any cookies Fresha refreshed for the next run
+        await self._save_session()
+        
+        logger.info(f"Scraped {stats['appointments']} appointments from {stats['windows']} windows "
+                    f"({stats['locations']} locations x {stats['days']} days) in {stats['seconds']:.1f}s "
+                    f"with {stats['pages']} pages, {stats['failed']} failed")
+        return stats
+    
+    async def scrape_and_save(self, start: str, end: str = None, locations: List[str] = None) -> dict:
+        return await self.scrape(start, end, locations, on_batch=self.save_appointments)
+    
+    async def _worker(self, queue: asyncio.Queue, on_batch: Optional[Callable], stats: dict):
+        page = await self.context.new_page()
+        try:
+            while not queue.empty():
+                location, day = queue.get_nowait()
+                url = day_url(day, location)
+                try:
+                    # Not `+= await`, which would add to the total read before other pages updated it
+                    count = await self._scrape_window(page, url, day, on_batch)
+                except Exception as error:
+                    stats['failed'] += 1
+                    logger.error(f'Failed to scrape {url}: {error}')
+                    continue
+                stats['appointments'] += count
+        finally:
+            await page.close()
+    
+    async def _scrape_window(self, page: Page, url: str, day: str, on_batch: Optional[Callable]) -> int:
+        """Page through one day's appointments URL, handing each batch of new appointments to on_batch"""
+        started = time.perf_counter()
+        state = PageState(url, day)
+        page.on('response', state.capture)
+        try:
+            # Only the page calls go through the breaker, as in FreshaScraper._iter_day
+            batch = await self._call(self._open_appointments, page, state)
+            while batch is not None:
+                new = state.add_batch(batch)
+                if new is None:
+                    break
+                if new and on_batch:
+                    # In a thread so SQLite writes do not hold up the other pages
+                    await asyncio.to_thread(on_batch, new)
+                if state.at_page_limit():
+                    break
+                batch = await self._call(self._next_page, page, state)
+        finally:
+            page.remove_listener('response', state.capture)
+        
+        logger.info(f'Scraped {state.appointments} appointments from {state.pages} pages of {url} '
+                    f'in {time.perf_counter() - started:.1f}s')
+        return state.appointments
+    
+    async def _open_appointments(self, page: Page, state: PageState) -> List[Appointment]:
+        logins = self._logins
+        try:
+            return await self._load_appointments(page, state)
+        except SessionExpiredError:
+            await self._relogin(logins)
+            return await self._load_appointments(page, state)
+    
+    async def _load_appointments(self, page: Page, state: PageState) -> List[Appointment]:
+        state.reset()
+        await self.pacer.wait(state.url)
+        logger.info(f'Navigating to {state.url}')
+        
+        if state.mode == 'api':
+            try:
+                async with page.expect_response(is_api_response, timeout=config.FRESHA_API_TIMEOUT_MS):
+                    await page.goto(state.url, wait_until='domcontentloaded', timeout=30000)
+                return await self._take_captured(state)
+            except PlaywrightTimeoutError:
+                if await self._on_login_page(page):
+                    raise SessionExpiredError()
+            state.use_dom()
+            await page.wait_for_load_state('networkidle', timeout=30000)
+        else:
+            await page.goto(state.url, wait_until='networkidle', timeout=30000)
+        
+        if await self._on_login_page(page):
+            raise SessionExpiredError()
+        await page.wait_for_timeout(3000)
+        return await self._take_rows(page, state)
+    
+    async def _next_page(self, page: Page, state: PageState) -> Optional[List[Appointment]]:
+        """Move to the next page or scroll for more; None when there is nothing more"""
+        if state.mode == 'dom':
+            rows = await self._take_rows(page, state)
+            if state.rows_left(rows):
+                return rows
+        
+        next_control = await page.query_selector(config.FRESHA_NEXT_PAGE_SELECTOR)
+        if next_control and not await next_control.is_enabled():
+            next_control = None
+        
+        async def advance():
+            if next_control:
+                await next_control.click()
+            else:
+                await page.eval_on_selector_all(APPOINTMENT_SELECTOR, SCROLL_TO_END_JS)
+        
+        # Before the page timeout starts, so waiting for a slot cannot use it up
+        await self.pacer.wait(page.url)
+        try:
+            if state.mode == 'api':
+                async with page.expect_response(is_api_response, timeout=config.FRESHA_PAGE_TIMEOUT_MS):
+                    await advance()
+                return await self._take_captured(state)
+            
+            await advance()
+            if next_control:
+                await page.wait_for_load_state('networkidle', timeout=config.FRESHA_PAGE_TIMEOUT_MS)
+                state.rows_replaced()
+            else:
+                await page.wait_for_function(
+                    MORE_ROWS_JS, arg=[APPOINTMENT_SELECTOR, state.row_offset], timeout=config.FRESHA_PAGE_TIMEOUT_MS
+                )
+        except PlaywrightTimeoutError:
+            return None
+        rows = await self._take_rows(page, state)
+        return rows if state.rows_taken else None
+    
+    async def _take_captured(self, state: PageState) -> List[Appointment]:
+        payloads = []
+        for response in state.take_responses():
+            try:
+                payloads.append((response.url, await response.json()))
+            except Exception as error:
+                payloads.append((response.url, error))
+        return parse_payloads(payloads)
+    
+    async def _take_rows(self, page: Page, state: PageState) -> List[Appointment]:
+        return state.take_rows(await page.eval_on_selector_all(APPOINTMENT_SELECTOR, EXTRACT_ROWS_JS, state.rows_arg))
+    
+    def save_appointments(self, appointments: List[Appointment]) -> dict:
+        try:
+            ids = save_appointments(appointments)
+            logger.info(f'Saved {len(ids)} appointments')
+            return ids
+        except Exception as error:
+            logger.error(f'Failed to save {len(appointments)} appointments: {error}')
+            raise
+    
+    async def close(self):
+        await run_async(browser_session.close_browser(self.playwright, self.browser, self.context))
+        self.browser = None
+        self.context = None
+        self.playwright = None
+
+def scrape_parallel(start: str, end: str = None, locations: List[str] = None,
+                    concurrency: int = None, request_interval: float = None, save: bool = True) -> dict:
+    """Log in and run AsyncFreshaScraper.scrape from synchronous code"""
+    async def run():
+        scraper = AsyncFreshaScraper(concurrency, request_interval)
+        try:
+            await scraper.initialize()
+            await scraper.login()
+            if save:
+                return await scraper.scrape_and_save(start, end, locations)
+            return await scraper.scrape(start, end, locations)
+        finally:
+            await scraper.close()
+    
+    return asyncio.run(run())
@@ -1,40 +0,0 @@
-from playwright.sync_api import sync_playwright, Browser, BrowserContext, Page
-
-def create_browser(playwright) -> Browser:
-    return playwright.chromium.launch(
-        headless=True,
-        args=[
-            '--no-sandbox',
-            '--disable-setuid-sandbox',
-            '--disable-dev-shm-usage',
-            '--disable-accelerated-2d-canvas',
-            '--no-first-run',
-            '--no-zygote',
-            '--disable-gpu',
-        ]
-    )
-
-def create_context(browser: Browser) -> BrowserContext:
-    return browser.new_context(
-        viewport={'width': 1920, 'height': 1080},
-        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    )
-
-def create_stealth_page(context: BrowserContext) -> Page:
-    page = context.new_page()
-    
-    page.add_init_script("""
-        Object.defineProperty(navigator, 'webdriver', {
-            get: () => false,
-        });
-        
-        Object.defineProperty(navigator, 'plugins', {
-            get: () => [1, 2, 3, 4, 5],
-        });
-        
-        Object.defineProperty(navigator, 'languages', {
-            get: () => ['en-US', 'en'],
-        });
-    """)
-    
-    return page
@@ -0,0 +1,155 @@
+import json
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+import urllib.request
+from threading import Event
+from pathlib import Path
+from typing import Optional
+from playwright.sync_api import sync_playwright
+from src.scraper.browser_session import BROWSER_ARGS
+from src.utils.config import config
+from src.utils.logger import logger
+
+def _children(pid: int) -> list:
+    children = []
+    for stat in Path('/proc').glob('[0-9]*/stat'):
+        try:
+            # The command name is in parentheses and may contain spaces
+            fields = stat.read_text().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(stat.parent.name))
+    return children
+
+def process_tree_rss(pid: int) -> int:
+    """Resident memory in bytes of a process and all its descendants (Linux)"""
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            for line in Path(f'/proc/{current}/status').read_text().splitlines():
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1]) * 1024
+                    break
+        except OSError:
+            continue
+        pending.extend(_children(current))
+    return total
+
+class BrowserDaemon:
+    """Keeps one headless Chromium running for scrapers to connect to over CDP.
+    
+    Scrapers with FRESHA_BROWSER_URL set open their own context in this
+    browser instead of launching one, and close only that context when done.
+    The browser is restarted if it exits, and once its process tree uses more
+    than memory_limit_mb while no pages are open; at twice the limit it is
+    restarted even if a scrape is running.
+    """
+    
+    def __init__(self, port: int = None, memory_limit_mb: int = None, check_interval: float = None):
+        self.port = port or config.FRESHA_BROWSER_PORT
+        self.memory_limit = (memory_limit_mb or config.FRESHA_BROWSER_MEMORY_LIMIT_MB) * 2**20
+        self.check_interval = check_interval or config.FRESHA_BROWSER_CHECK_SECONDS
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self._profile_dir = None
+        self._stop = Event()
+    
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+    
+    def _executable(self) -> str:
+        with sync_playwright() as playwright:
+            return playwright.chromium.executable_path
+    
+    def _cdp(self, path: str):
+        with urllib.request.urlopen(f'{self.url}{path}', timeout=5) as response:
+            return json.load(response)
+    
+    def start(self):
+        self._profile_dir = tempfile.mkdtemp(prefix='fresha-browser-')
+        self.process = subprocess.Popen([
+            self._executable(),
+            '--headless=new',
+            f'--remote-debugging-port={self.port}',
+            '--remote-debugging-address=127.0.0.1',
+            f'--user-data-dir={self._profile_dir}',
+            *BROWSER_ARGS,
+            'about:blank',
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'Chromium exited with code {self.process.returncode} on start')
+            try:
+                version = self._cdp('/json/version')
+                logger.info(f"Browser daemon started {version.get('Browser')} at {self.url} (pid {self.process.pid})")
+                return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f'Chromium did not open its debugging port {self.port}')
+    
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        if self._profile_dir:
+            shutil.rmtree(self._profile_dir, ignore_errors=True)
+            self._profile_dir = None
+    
+    def restart(self, reason: str):
+        logger.warning(f'Restarting browser daemon: {reason}')
+        self.stop()
+        self.restarts += 1
+        self.start()
+    
+    def _busy(self) -> bool:
+        """Whether a scraper has a page open"""
+        try:
+            targets = self._cdp('/json/list')
+        except OSError:
+            return False
+        return any(target.get('type') == 'page' and target.get('url') != 'about:blank' for target in targets)
+    
+    def check(self):
+        """Restart the browser if it died or has grown past the memory limit"""
+        if self.process is None:
+            self.restart('Chromium is not running')
+            return
+        if self.process.poll() is not None:
+            self.restart(f'Chromium exited with code {self.process.returncode}')
+            return
+        rss = process_tree_rss(self.process.pid)
+        if rss > 2 * self.memory_limit:
+            self.restart(f'using {rss / 2**20:.0f} MB, twice the limit')
+        elif rss > self.memory_limit and not self._busy():
+            self.restart(f'using {rss / 2**20:.0f} MB, over the {self.memory_limit / 2**20:.0f} MB limit')
+    
+    def run(self):
+        """Start the browser and supervise it until SIGTERM or Ctrl-C"""
+        signal.signal(signal.SIGTERM, lambda signum, frame: self._stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: self._stop.set())
+        self.start()
+        try:
+            while not self._stop.wait(self.check_interval):
+                try:
+                    self.check()
+                except Exception as error:
+                    # Tried again at the next check
+                    logger.error(f'Browser daemon restart failed: {error}')
+                    self.stop()
+        finally:
+            self.stop()
+            logger.info(f'Browser daemon stopped after {self.restarts} restarts')
@@ -0,0 +1,211 @@
+import inspect
+import json
+import os
+from typing import Any, Callable, Generator, Optional
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from src.utils.circuit_breaker import CircuitBreaker
+from src.utils.config import config
+from src.utils.logger import logger
+from src.scraper.paging import LOGIN_FORM_SELECTOR, is_login_url
+
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-accelerated-2d-canvas',
+    '--no-first-run',
+    '--no-zygote',
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--mute-audio',
+]
+
+EMAIL_INPUT = 'input[type="email"], input[name="email"]'
+PASSWORD_INPUT = 'input[type="password"], input[name="password"]'
+LOGIN_BUTTON = 'button[type="submit"], button:has-text("Sign in"), button:has-text("Log in")'
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => false,
+    });
+    
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5],
+    });
+    
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['en-US', 'en'],
+    });
+"""
+
+# Shared by every scraper in the process so a Fresha outage fails fast
+fresha_breaker = CircuitBreaker(
+    'Fresha',
+    failure_threshold=config.FRESHA_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=config.FRESHA_CIRCUIT_RESET_TIMEOUT
+)
+
+class SessionExpiredError(Exception):
+    """Fresha sent the browser back to the login page"""
+
+# The browser setup and login steps below are generators of Playwright calls,
+# (target, method, args, kwargs). run_sync and run_async make each call on the
+# sync or async API and send back its result or throw its error, so
+# FreshaScraper and AsyncFreshaScraper share one copy of every step.
+Flow = Generator[tuple, Any, Any]
+
+def call(target, method: str, *args, **kwargs) -> tuple:
+    return target, method, args, kwargs
+
+def run_sync(flow: Flow):
+    """Run a flow on playwright.sync_api objects and return its result"""
+    result, error = None, None
+    while True:
+        try:
+            target, method, args, kwargs = flow.throw(error) if error else flow.send(result)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            result = getattr(target, method)(*args, **kwargs)
+        except Exception as call_error:
+            error = call_error
+
+async def run_async(flow: Flow):
+    """Run a flow on playwright.async_api objects and return its result"""
+    result, error = None, None
+    while True:
+        try:
+            target, method, args, kwargs = flow.throw(error) if error else flow.send(result)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            result = getattr(target, method)(*args, **kwargs)
+            # A few async_api methods, e.g. Page.on, are not coroutines
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception as call_error:
+            error = call_error
+
+def write_session_state(state: dict):
+    """Save browser storage state to FRESHA_SESSION_PATH, readable only by its owner"""
+    path = config.FRESHA_SESSION_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Created 0600 rather than chmod-ed afterwards: it holds live session cookies
+    temp_path = path.with_name(path.name + '.tmp')
+    temp_path.unlink(missing_ok=True)
+    with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w') as file:
+        json.dump(state, file)
+    os.replace(temp_path, path)
+
+def clear_session():
+    config.FRESHA_SESSION_PATH.unlink(missing_ok=True)
+
+def open_browser(playwright) -> Flow:
+    """Connect to the browser daemon if one is configured, else launch Chromium"""
+    if config.FRESHA_BROWSER_URL:
+        try:
+            browser = yield call(playwright.chromium, 'connect_over_cdp', config.FRESHA_BROWSER_URL, timeout=10000)
+            logger.info(f'Connected to browser daemon at {config.FRESHA_BROWSER_URL}')
+            return browser
+        except Exception as error:
+            logger.warning(f'Browser daemon unavailable, launching a browser: {error}')
+    return (yield call(playwright.chromium, 'launch', headless=True, args=BROWSER_ARGS))
+
+def new_context(browser, route_handler: Optional[Callable] = None) -> Flow:
+    """A browser context starting from the saved session, if there is one"""
+    # Cookies and local storage from the last login
+    session_path = config.FRESHA_SESSION_PATH
+    context = yield call(
+        browser, 'new_context',
+        viewport={'width': 1280, 'height': 800},
+        user_agent=USER_AGENT,
+        storage_state=str(session_path) if session_path.exists() else None
+    )
+    yield call(context, 'add_init_script', STEALTH_SCRIPT)
+    # Routing turns off the browser cache, so only route when something is blocked
+    if route_handler:
+        yield call(context, 'route', '**/*', route_handler)
+    return context
+
+def on_login_page(page) -> Flow:
+    if is_login_url(page.url):
+        return True
+    return (yield call(page, 'query_selector', LOGIN_FORM_SELECTOR)) is not None
+
+def session_valid(page) -> Flow:
+    """Whether the saved session still reaches the dashboard, without waiting for it to render"""
+    if not config.FRESHA_SESSION_PATH.exists():
+        return False
+    try:
+        yield call(page, 'goto', f'{config.FRESHA_BASE_URL}/dashboard', wait_until='domcontentloaded', timeout=15000)
+    except PlaywrightTimeoutError:
+        return False
+    if (yield from on_login_page(page)):
+        logger.info('Saved Fresha session expired')
+        clear_session()
+        return False
+    return True
+
+def save_session(context) -> Flow:
+    state = yield call(context, 'storage_state')
+    # Only saves the next run a login, so it must not fail this one
+    try:
+        write_session_state(state)
+    except OSError as error:
+        logger.warning(f'Could not save the Fresha session: {error}')
+
+def full_login(page, context) -> Flow:
+    """Fill in the login form and save the new session"""
+    try:
+        logger.info('Navigating to Fresha login page')
+        yield call(page, 'goto', f'{config.FRESHA_BASE_URL}/login', wait_until='networkidle', timeout=30000)
+        
+        yield call(page, 'wait_for_selector', EMAIL_INPUT, timeout=10000)
+        
+        email_input = yield call(page, 'query_selector', EMAIL_INPUT)
+        password_input = yield call(page, 'query_selector', PASSWORD_INPUT)
+        
+        if not email_input or not password_input:
+            raise Exception('Login form not found')
+        
+        yield call(email_input, 'fill', config.FRESHA_EMAIL)
+        yield call(password_input, 'fill', config.FRESHA_PASSWORD)
+        
+        login_button = yield call(page, 'query_selector', LOGIN_BUTTON)
+        if login_button:
+            yield call(login_button, 'click')
+        else:
+            yield call(page.keyboard, 'press', 'Enter')
+        
+        yield call(page, 'wait_for_url', '**/dashboard**', timeout=30000)
+        yield from save_session(context)
+        logger.info('Successfully logged in to Fresha')
+    except Exception as error:
+        logger.error(f'Login failed: {error}')
+        raise
+
+def login(page, context) -> Flow:
+    """Reuse the saved session if it is still valid, else log in; returns whether it logged in"""
+    if (yield from session_valid(page)):
+        logger.info('Reusing saved Fresha session')
+        return False
+    yield from full_login(page, context)
+    return True
+
+def close_browser(playwright, browser, context) -> Flow:
+    # On a browser daemon this only drops our context and connection
+    if context:
+        try:
+            yield call(context, 'close')
+        except Exception as error:
+            logger.warning(f'Error closing browser context: {error}')
+    if browser:
+        yield call(browser, 'close')
+    if playwright:
+        yield call(playwright, 'stop')
+    logger.info('Browser closed')
@@ -0,0 +1,104 @@
+import hashlib
+import re
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional
+from src.database.models import Appointment
+from src.utils.dates import local_date
+
+# Elements that may hold one appointment, widest last; matched in the page by
+# EXTRACT_ROWS_JS and offline by extract_rows. MAX_ROWS rows are read per batch
+APPOINTMENT_SELECTOR = '[data-appointment-id], .appointment-item, [class*="appointment"]'
+ALTERNATIVE_SELECTOR = 'tr, .calendar-event, [class*="booking"]'
+MAX_ROWS = 50
+
+# Run by page.eval_on_selector_all with [offset, limit]: one round trip returns a
+# whole batch of candidate rows
+EXTRACT_ROWS_JS = '''(elements, [offset, limit]) => elements.slice(offset, offset + limit).map(element => ({
+    id: element.getAttribute('data-appointment-id') || element.id || null,
+    text: element.innerText || ''
+}))'''
+
+_NAME = re.compile(r'([A-Z][a-z]+ [A-Z][a-z]+)')
+_EMAIL = re.compile(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})')
+_DATE = re.compile(r'(\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2})')
+
+def _row_id(text: str) -> str:
+    # Rows without an id get one derived from their text, so rescraping the
+    # same appointment updates it instead of adding a copy
+    return 'appt-' + hashlib.sha1(text.encode()).hexdigest()[:16]
+
+def parse_row(row: dict, day: str = None) -> Optional[Appointment]:
+    """Build an Appointment from an extracted {'id', 'text'} row, or None without an email.
+    
+    A row that shows no date is taken to be on `day`, the YYYY-MM-DD day
+    being scraped (the salon's today if not given), with no time of day.
+    """
+    text = row.get('text') or ''
+    email_match = _EMAIL.search(text)
+    if not email_match:
+        return None
+    
+    name_match = _NAME.search(text)
+    date_match = _DATE.search(text)
+    return Appointment(
+        fresha_id=row.get('id') or _row_id(text),
+        customer_name=name_match.group(1) if name_match else 'Unknown Customer',
+        customer_email=email_match.group(1),
+        appointment_date=date_match.group(1) if date_match else day or local_date(),
+        service_type='Nail Service'
+    )
+
+def parse_rows(rows: Iterable[dict], day: str = None) -> List[Appointment]:
+    return [appointment for appointment in (parse_row(row, day) for row in rows) if appointment]
+
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+_BLOCK_TAGS = {'br', 'div', 'p', 'li', 'tr', 'td', 'th', 'section', 'article', 'header', 'footer', 'h1', 'h2', 'h3', 'h4'}
+
+def _is_candidate(attrs: dict) -> bool:
+    classes = attrs.get('class') or ''
+    return 'data-appointment-id' in attrs or 'appointment' in classes
+
+class _RowExtractor(HTMLParser):
+    """Collects {'id', 'text'} for APPOINTMENT_SELECTOR elements, like EXTRACT_ROWS_JS"""
+    
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        # One entry per open element: the row it started, or None
+        self._stack = []
+        self._open_rows = []
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self.handle_data('\n')
+        if tag in _VOID_TAGS:
+            return
+        attrs = dict(attrs)
+        row = None
+        if _is_candidate(attrs):
+            row = {'id': attrs.get('data-appointment-id') or attrs.get('id') or None, 'text': []}
+            self.rows.append(row)
+            self._open_rows.append(row)
+        self._stack.append(row)
+    
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS or not self._stack:
+            return
+        row = self._stack.pop()
+        if row is not None:
+            self._open_rows.remove(row)
+    
+    def handle_data(self, data):
+        for row in self._open_rows:
+            row['text'].append(data)
+
+def extract_rows(html: str, limit: int = MAX_ROWS) -> List[dict]:
+    """Offline equivalent of EXTRACT_ROWS_JS for saved HTML"""
+    parser = _RowExtractor()
+    parser.feed(html)
+    parser.close()
+    rows = []
+    for row in parser.rows[:limit]:
+        lines = (' '.join(line.split()) for line in ''.join(row['text']).splitlines())
+        rows.append({'id': row['id'], 'text': '\n'.join(line for line in lines if line)})
+    return rows
@@ -0,0 +1,87 @@
+import re
+from typing import Any, Iterator, List, Optional
+from src.database.models import Appointment
+from src.utils.config import config
+
+_API_URL = re.compile(config.FRESHA_API_URL_PATTERN)
+
+# Keys that wrap the list of records in the responses seen so far
+_CONTAINER_KEYS = ('appointments', 'bookings', 'items', 'results', 'data', 'edges')
+_CANCELLED = {'cancelled', 'canceled', 'deleted'}
+
+def is_appointments_response(url: str, content_type: str) -> bool:
+    """Whether a response the Fresha web app fetched carries appointment JSON"""
+    return 'json' in (content_type or '') and bool(_API_URL.search(url))
+
+def _first(record: dict, *keys) -> Any:
+    for key in keys:
+        value = record.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+def _find_records(payload: Any) -> Iterator[dict]:
+    """Yield appointment-like dicts from a list, an envelope or GraphQL edges"""
+    if isinstance(payload, list):
+        for item in payload:
+            if isinstance(item, dict):
+                node = item.get('node')
+                yield node if isinstance(node, dict) else item
+    elif isinstance(payload, dict):
+        for key in _CONTAINER_KEYS:
+            if key in payload:
+                yield from _find_records(payload[key])
+                return
+        if _first(payload, 'id', 'appointmentId'):
+            yield payload
+
+def _customer(record: dict) -> tuple:
+    client = _first(record, 'client', 'customer') or {}
+    if not isinstance(client, dict):
+        client = {}
+    name = _first(client, 'fullName', 'name') or ' '.join(
+        part for part in (_first(client, 'firstName', 'first_name'), _first(client, 'lastName', 'last_name')) if part
+    ) or _first(record, 'clientName', 'customerName')
+    email = _first(client, 'email') or _first(record, 'clientEmail', 'customerEmail', 'email')
+    return name, email
+
+def _service(record: dict) -> Optional[str]:
+    services = record.get('services')
+    if isinstance(services, list):
+        names = [_first(service, 'name', 'serviceName', 'title') for service in services if isinstance(service, dict)]
+        names = [name for name in names if name]
+        if names:
+            return ', '.join(names)
+    service = record.get('service')
+    if isinstance(service, dict):
+        return _first(service, 'name', 'title')
+    return service or _first(record, 'serviceName', 'serviceTitle')
+
+def parse_appointment(record: dict) -> Optional[Appointment]:
+    """Build an Appointment from one API record, or None if it cannot be emailed"""
+    fresha_id = _first(record, 'id', 'appointmentId', 'uuid')
+    status = str(record.get('status') or '').lower()
+    if fresha_id is None or status in _CANCELLED:
+        return None
+    
+    customer_name, customer_email = _customer(record)
+    appointment_date = _first(record, 'startTime', 'startAt', 'startsAt', 'start_at', 'start', 'scheduledAt', 'date')
+    if not customer_email or not appointment_date:
+        return None
+    
+    return Appointment(
+        fresha_id=str(fresha_id),
+        customer_name=customer_name or 'Unknown Customer',
+        customer_email=customer_email,
+        appointment_date=str(appointment_date),
+        service_type=_service(record) or 'Nail Service'
+    )
+
+def parse_appointments_payload(payload: Any) -> List[Appointment]:
+    """Appointments in a captured JSON response; records that cannot be used are skipped"""
+    appointments = []
+    for record in _find_records(payload):
+        appointment = parse_appointment(record)
+        if appointment:
+            appointments.append(appointment)
+    return appointments
@@ -1,146 +1,261 @@
-from playwright.sync_api import sync_playwright, Browser, Page
+from typing import Iterator, Optional
+from playwright.sync_api import sync_playwright, Browser, BrowserContext, Page, TimeoutError as PlaywrightTimeoutError
 from src.utils.config import config
 from src.utils.logger import logger
 from src.database.db import init_database
-from src.database.models import save_appointment, Appointment
+from src.database.models import save_appointments, Appointment
+from src.utils.circuit_breaker import CircuitBreaker
+from src.scraper import browser_session
+from src.scraper.browser_session import SessionExpiredError, fresha_breaker, run_sync
+from src.scraper.dom_parser import APPOINTMENT_SELECTOR, ALTERNATIVE_SELECTOR, EXTRACT_ROWS_JS
+from src.scraper.paging import (
+    MORE_ROWS_JS, SCROLL_TO_END_JS, PageState, day_url, days, is_api_response, parse_payloads
+)
+from src.scraper.request_policy import RequestPolicy
+
+# Navigation timing and transfer totals for the current page
+PAGE_TIMING_JS = '''() => {
+    const navigation = performance.getEntriesByType('navigation')[0];
+    const resources = performance.getEntriesByType('resource');
+    return {
+        load_ms: navigation ? navigation.duration : null,
+        requests: resources.length + 1,
+        transferred: resources.reduce((total, entry) => total + (entry.transferSize || 0),
+                                      navigation ? navigation.transferSize || 0 : 0)
+    };
+}'''
 
 class FreshaScraper:
-    def __init__(self):
+    def __init__(self, breaker: CircuitBreaker = None, request_policy: RequestPolicy = None):
+        self.breaker = breaker or fresha_breaker
         self.browser: Browser = None
+        self.context: BrowserContext = None
         self.page: Page = None
         self.playwright = None
+        self.request_policy = request_policy or RequestPolicy.from_config()
     
     def initialize(self):
         init_database()
         self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-dev-shm-usage',
-            ]
-        )
-        context = self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        )
-        self.page = context.new_page()
+        self.browser = run_sync(browser_session.open_browser(self.playwright))
+        self.context = self._new_context()
+        self.page = self.context.new_page()
         logger.info('Browser initialized')
     
+    def _new_context(self) -> BrowserContext:
+        route_handler = self.request_policy.handle if self.request_policy.enabled else None
+        return run_sync(browser_session.new_context(self.browser, route_handler))
+    
+    def page_metrics(self) -> dict:
+        """Load time, request count, bytes transferred and JS heap of the current page"""
+        metrics = self.page.evaluate(PAGE_TIMING_JS)
+        cdp = self.context.new_cdp_session(self.page)
+        try:
+            cdp.send('Performance.enable')
+            performance = {metric['name']: metric['value'] for metric in cdp.send('Performance.getMetrics')['metrics']}
+        finally:
+            cdp.detach()
+        metrics['js_heap'] = performance.get('JSHeapUsedSize')
+        metrics['blocked'] = self.request_policy.blocked
+        return metrics
+    
+    def _log_page_metrics(self):
+        try:
+            metrics = self.page_metrics()
+        except Exception as error:
+            logger.warning(f'Could not read page metrics: {error}')
+            return
+        load = f"{metrics['load_ms']:.0f} ms" if metrics['load_ms'] is not None else 'unknown time'
+        heap = f"{metrics['js_heap'] / 2**20:.1f} MB" if metrics['js_heap'] is not None else 'unknown'
+        logger.info(f"Appointments page loaded in {load}: {metrics['requests']} requests, "
+                    f"{metrics['blocked']} blocked, {metrics['transferred'] / 1024:.0f} KB transferred, JS heap {heap}")
+    
     def login(self):
+        return self.breaker.call(self._login)
+    
+    def _login(self):
         if not self.page:
             raise Exception('Page not initialized')
-        
-        try:
-            logger.info('Navigating to Fresha login page')
-            self.page.goto('https://www.fresha.com/login', wait_until='networkidle', timeout=30000)
-            
-            self.page.wait_for_selector('input[type="email"], input[name="email"]', timeout=10000)
-            
-            email_input = self.page.query_selector('input[type="email"], input[name="email"]')
-            password_input = self.page.query_selector('input[type="password"], input[name="password"]')
-            
-            if not email_input or not password_input:
-                raise Exception('Login form not found')
-            
-            email_input.fill(config.FRESHA_EMAIL)
-            password_input.fill(config.FRESHA_PASSWORD)
-            
-            login_button = self.page.query_selector('button[type="submit"], button:has-text("Sign in"), button:has-text("Log in")')
-            if login_button:
-                login_button.click()
-            else:
-                self.page.keyboard.press('Enter')
-            
-            self.page.wait_for_url('**/dashboard**', timeout=30000)
-            logger.info('Successfully logged in to Fresha')
-        except Exception as error:
-            logger.error(f'Login failed: {error}')
-            raise
+        run_sync(browser_session.login(self.page, self.context))
+    
+    def _on_login_page(self) -> bool:
+        return run_sync(browser_session.on_login_page(self.page))
+    
+    def _save_session(self):
+        run_sync(browser_session.save_session(self.context))
+    
+    def clear_session(self):
+        browser_session.clear_session()
+    
+    def _full_login(self):
+        run_sync(browser_session.full_login(self.page, self.context))
     
     def scrape_appointments(self) -> list[Appointment]:
+        """Every appointment on the default appointments page, across all its pages"""
+        return [appointment for batch in self.iter_appointment_batches() for appointment in batch]
+    
+    def iter_appointment_batches(self, start: str = None, end: str = None) -> Iterator[list[Appointment]]:
+        """Yield appointments a page at a time for each local day from start to end.
+        
+        Without dates the default appointments page is read. Each day's
+        next-page links or infinite scroll are followed until no more
+        appointments load or a page only repeats earlier ones, up to
+        FRESHA_MAX_PAGES. A batch only holds appointments
+        not yet yielded for its day, so callers can save each batch and drop it.
+        """
         if not self.page:
             raise Exception('Page not initialized')
         
+        for day in [None] if start is None else days(start, end):
+            yield from self._iter_day(day)
+        # Keep any cookies Fresha refreshed for the next run
+        self._save_session()
+    
+    def scrape_and_save(self, start: str = None, end: str = None) -> int:
+        """Save appointments batch by batch as they are scraped; returns how many"""
+        saved = 0
+        for batch in self.iter_appointment_batches(start, end):
+            self.save_appointments(batch)
+            saved += len(batch)
+        return saved
+    
+    def _iter_day(self, day: Optional[str]) -> Iterator[list[Appointment]]:
+        url = day_url(day)
+        state = PageState(url, day)
+        self.page.on('response', state.capture)
         try:
-            logger.info('Navigating to appointments page')
-            self.page.goto('https://www.fresha.com/appointments', wait_until='networkidle', timeout=30000)
-            self.page.wait_for_timeout(3000)
-            
-            appointments = []
-            appointment_elements = self.page.query_selector_all('[data-appointment-id], .appointment-item, [class*="appointment"]')
-            
-            if not appointment_elements:
-                logger.warn('No appointment elements found, trying alternative selectors')
-                alt_elements = self.page.query_selector_all('tr, .calendar-event, [class*="booking"]')
-                if alt_elements:
-                    logger.info(f'Found {len(alt_elements)} potential appointment elements')
-            
-            for element in appointment_elements[:50]:
-                try:
-                    fresha_id = element.get_attribute('data-appointment-id') or \
-                               element.get_attribute('id') or \
-                               f'appt-{int(__import__("time").time() * 1000)}-{__import__("random").random()}'
-                    
-                    text = element.inner_text() or ''
-                    import re
-                    customer_name_match = re.search(r'([A-Z][a-z]+ [A-Z][a-z]+)', text)
-                    email_match = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', text)
-                    
-                    customer_name = customer_name_match.group(1) if customer_name_match else 'Unknown Customer'
-                    customer_email = email_match.group(1) if email_match else ''
-                    
-                    if not customer_email:
-                        logger.warn(f'Skipping appointment {fresha_id} - no email found')
-                        continue
-                    
-                    date_match = re.search(r'(\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2})', text)
-                    appointment_date = date_match.group(1) if date_match else __import__('datetime').datetime.now().isoformat()
-                    
-                    appointment = Appointment(
-                        fresha_id=fresha_id,
-                        customer_name=customer_name,
-                        customer_email=customer_email,
-                        appointment_date=appointment_date,
-                        service_type='Nail Service'
-                    )
-                    
-                    appointments.append(appointment)
-                except Exception as error:
-                    logger.warn(f'Error parsing appointment element: {error}')
+            batch = self.breaker.call(self._open_appointments, state)
+            while batch is not None:
+                new = state.add_batch(batch)
+                if new is None:
+                    break
+                if new:
+                    yield new
+                if state.at_page_limit():
+                    break
+                batch = self.breaker.call(self._next_page, state)
+        finally:
+            self.page.remove_listener('response', state.capture)
+        
+        logger.info(f'Scraped {state.appointments} appointments from {state.pages} pages of {url}')
+        self._log_page_metrics()
+    
+    def _open_appointments(self, state: PageState) -> list[Appointment]:
+        try:
+            return self._load_appointments(state)
+        except SessionExpiredError:
+            logger.info('Fresha session expired, logging in again')
+            self.clear_session()
+            self._full_login()
+            return self._load_appointments(state)
+    
+    def _load_appointments(self, state: PageState) -> list[Appointment]:
+        """Load an appointments page and return its first page of appointments"""
+        self.request_policy.blocked = 0
+        state.reset()
+        logger.info(f'Navigating to {state.url}')
+        
+        if state.mode == 'api':
+            try:
+                with self.page.expect_response(is_api_response, timeout=config.FRESHA_API_TIMEOUT_MS):
+                    self.page.goto(state.url, wait_until='domcontentloaded', timeout=30000)
+                return self._take_captured(state)
+            except PlaywrightTimeoutError:
+                if self._on_login_page():
+                    raise SessionExpiredError()
+            state.use_dom()
+            self.page.wait_for_load_state('networkidle', timeout=30000)
+        else:
+            self.page.goto(state.url, wait_until='networkidle', timeout=30000)
+        
+        if self._on_login_page():
+            raise SessionExpiredError()
+        self.page.wait_for_timeout(3000)
+        
+        rows = self._take_rows(state)
+        if not rows and not state.row_offset:
+            logger.warn('No appointment elements found, trying alternative selectors')
+            alt_count = self.page.eval_on_selector_all(ALTERNATIVE_SELECTOR, 'elements => elements.length')
+            if alt_count:
+                logger.info(f'Found {alt_count} potential appointment elements')
+        return rows
+    
+    def _next_page(self, state: PageState) -> Optional[list[Appointment]]:
+        """Move to the next page or scroll for more; None when there is nothing more"""
+        if state.mode == 'dom':
+            # Rows past the last batch may already be on the page
+            rows = self._take_rows(state)
+            if state.rows_left(rows):
+                return rows
+        
+        next_control = self.page.query_selector(config.FRESHA_NEXT_PAGE_SELECTOR)
+        if next_control and not next_control.is_enabled():
+            next_control = None
+        
+        def advance():
+            if next_control:
+                next_control.click()
+            else:
+                self.page.eval_on_selector_all(APPOINTMENT_SELECTOR, SCROLL_TO_END_JS)
+        
+        try:
+            if state.mode == 'api':
+                with self.page.expect_response(is_api_response, timeout=config.FRESHA_PAGE_TIMEOUT_MS):
+                    advance()
+                return self._take_captured(state)
             
-            logger.info(f'Scraped {len(appointments)} appointments')
-            return appointments
-        except Exception as error:
-            logger.error(f'Error scraping appointments: {error}')
-            raise
+            advance()
+            if next_control:
+                # A new page replaces the rows instead of adding to them
+                self.page.wait_for_load_state('networkidle', timeout=config.FRESHA_PAGE_TIMEOUT_MS)
+                state.rows_replaced()
+            else:
+                self.page.wait_for_function(
+                    MORE_ROWS_JS, arg=[APPOINTMENT_SELECTOR, state.row_offset], timeout=config.FRESHA_PAGE_TIMEOUT_MS
+                )
+        except PlaywrightTimeoutError:
+            return None
+        rows = self._take_rows(state)
+        return rows if state.rows_taken else None
     
-    def save_appointments(self, appointments: list[Appointment]):
-        for appointment in appointments:
+    def _take_captured(self, state: PageState) -> list[Appointment]:
+        """Parse and forget the appointment responses captured so far"""
+        payloads = []
+        for response in state.take_responses():
             try:
-                save_appointment(appointment)
-                logger.info(f'Saved appointment for {appointment.customer_name}')
+                payloads.append((response.url, response.json()))
             except Exception as error:
-                logger.error(f'Failed to save appointment for {appointment.customer_name}: {error}')
+                payloads.append((response.url, error))
+        return parse_payloads(payloads)
+    
+    def _take_rows(self, state: PageState) -> list[Appointment]:
+        """Parse the next MAX_ROWS page rows after those already taken"""
+        # One round trip for every row instead of three per element
+        return state.take_rows(self.page.eval_on_selector_all(APPOINTMENT_SELECTOR, EXTRACT_ROWS_JS, state.rows_arg))
+    
+    def save_appointments(self, appointments: list[Appointment]) -> dict:
+        try:
+            ids = save_appointments(appointments)
+            logger.info(f'Saved {len(ids)} appointments')
+            return ids
+        except Exception as error:
+            logger.error(f'Failed to save {len(appointments)} appointments: {error}')
+            raise
     
     def close(self):
-        if self.browser:
-            self.browser.close()
-        if self.playwright:
-            self.playwright.stop()
+        run_sync(browser_session.close_browser(self.playwright, self.browser, self.context))
         self.browser = None
+        self.context = None
         self.page = None
-        logger.info('Browser closed')
+        self.playwright = None
 
 def main():
     scraper = FreshaScraper()
     try:
         scraper.initialize()
         scraper.login()
-        appointments = scraper.scrape_appointments()
-        scraper.save_appointments(appointments)
-        logger.info(f'Successfully processed {len(appointments)} appointments')
+        saved = scraper.scrape_and_save()
+        logger.info(f'Successfully processed {saved} appointments')
     except Exception as error:
         logger.error(f'Scraper failed: {error}')
         import sys
@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from src.utils.config import config
+from src.utils.logger import logger
+from src.database.models import Appointment
+from src.scraper.fresha_api import is_appointments_response, parse_appointments_payload
+from src.scraper.dom_parser import MAX_ROWS, parse_row
+
+# Present on the login page only; its appearance means the session has expired
+LOGIN_FORM_SELECTOR = 'input[type="password"]'
+
+# Brings more rows into view for infinite-scroll lists, in a container or the window
+SCROLL_TO_END_JS = '''elements => {
+    if (elements.length) elements[elements.length - 1].scrollIntoView();
+    window.scrollTo(0, document.body.scrollHeight);
+}'''
+
+# Waited on with [selector, count] until scrolling has added rows
+MORE_ROWS_JS = '([selector, count]) => document.querySelectorAll(selector).length > count'
+
+def days(start: str, end: str = None) -> Iterator[str]:
+    """Each YYYY-MM-DD day from start to end (or just start), inclusive"""
+    day, last = date.fromisoformat(start), date.fromisoformat(end or start)
+    while day <= last:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+def day_url(day: str = None, location: str = None) -> str:
+    """Appointments page for one local day, at one location if given; the default page without a day"""
+    if day is None:
+        return f'{config.FRESHA_BASE_URL}/appointments'
+    if location:
+        return config.FRESHA_LOCATION_DAY_URL.format(base_url=config.FRESHA_BASE_URL, date=day, location=location)
+    return config.FRESHA_DAY_URL.format(base_url=config.FRESHA_BASE_URL, date=day)
+
+def is_login_url(url: str) -> bool:
+    return '/login' in url
+
+def is_api_response(response) -> bool:
+    return is_appointments_response(response.url, response.headers.get('content-type', ''))
+
+def parse_payloads(payloads: Iterable[Tuple[str, Any]]) -> List[Appointment]:
+    """Appointments from (url, payload) pairs; a payload that could not be read is the exception"""
+    appointments = []
+    for url, payload in payloads:
+        if isinstance(payload, Exception):
+            logger.warning(f'Unreadable appointment response from {url}: {payload}')
+            continue
+        appointments.extend(parse_appointments_payload(payload))
+    return appointments
+
+class PageState:
+    """What a scraper has read of one appointments URL, and when to stop.
+    
+    FreshaScraper and AsyncFreshaScraper make the Playwright calls for a page
+    and hand the results here, so both page through, fall back from the API
+    to the page text and stop the same way.
+    """
+    
+    def __init__(self, url: str, day: str = None):
+        self.url = url
+        # The day the URL lists; page rows showing no date are on it
+        self.day = day
+        self.mode = config.FRESHA_SCRAPE_MODE
+        self.pages = 0
+        self.row_offset = 0
+        self.rows_taken = 0
+        self._responses = []
+        self._seen = set()
+    
+    @property
+    def appointments(self) -> int:
+        return len(self._seen)
+    
+    def reset(self):
+        """Start over on the URL, e.g. after logging in again"""
+        self.mode = config.FRESHA_SCRAPE_MODE
+        self.row_offset = 0
+        self.rows_taken = 0
+        self._responses = []
+    
+    def capture(self, response):
+        """Playwright 'response' listener collecting appointment API responses"""
+        if self.mode == 'api' and is_api_response(response):
+            self._responses.append(response)
+    
+    def take_responses(self) -> list:
+        """The appointment responses captured since the last call"""
+        responses, self._responses = self._responses, []
+        return responses
+    
+    def use_dom(self):
+        logger.warning(f'No appointment data captured from the Fresha API for {self.url}, reading the page instead')
+        self.mode = 'dom'
+    
+    @property
+    def rows_arg(self) -> list:
+        """EXTRACT_ROWS_JS argument for the next batch of page rows"""
+        return [self.row_offset, MAX_ROWS]
+    
+    def take_rows(self, rows: List[dict]) -> List[Appointment]:
+        """Parse a batch of rows read with rows_arg"""
+        self.row_offset += len(rows)
+        self.rows_taken = len(rows)
+        appointments = []
+        for row in rows:
+            appointment = parse_row(row, self.day)
+            if appointment:
+                appointments.append(appointment)
+            else:
+                logger.warn(f"Skipping appointment {row.get('id') or 'without id'} - no email found")
+        return appointments
+    
+    def rows_left(self, appointments: List[Appointment]) -> bool:
+        """Whether a batch taken before paging on came from rows already on the page"""
+        return bool(appointments or self.rows_taken)
+    
+    def rows_replaced(self):
+        """A next-page control swapped the page's rows for new ones"""
+        self.row_offset = 0
+    
+    def add_batch(self, batch: List[Appointment]) -> Optional[List[Appointment]]:
+        """The appointments in a page's batch not seen before; None if the page only repeats earlier ones"""
+        self.pages += 1
+        new = [appointment for appointment in batch if appointment.fresha_id not in self._seen]
+        # A page of repeats means paging has come back around
+        if batch and not new:
+            return None
+        self._seen.update(appointment.fresha_id for appointment in new)
+        return new
+    
+    def at_page_limit(self) -> bool:
+        if self.pages >= config.FRESHA_MAX_PAGES:
+            logger.warning(f'Stopped after {self.pages} pages of {self.url}')
+            return True
+        return False
@@ -0,0 +1,51 @@
+from typing import Iterable
+from urllib.parse import urlsplit
+from src.utils.config import config
+
+def _split(value: str) -> list:
+    return [item.strip().lower() for item in value.split(',') if item.strip()]
+
+class RequestPolicy:
+    """Decides which browser requests the scraper aborts.
+    
+    Requests are blocked by Playwright resource type (image, font, media,
+    stylesheet, ...) or by host; a host entry also covers its subdomains.
+    Neither the appointment JSON nor the page text needs any of them.
+    """
+    
+    def __init__(self, resource_types: Iterable[str] = (), hosts: Iterable[str] = ()):
+        self.resource_types = frozenset(resource_types)
+        self.hosts = tuple(hosts)
+        self.blocked = 0
+    
+    @classmethod
+    def from_config(cls) -> 'RequestPolicy':
+        return cls(_split(config.FRESHA_BLOCKED_RESOURCE_TYPES), _split(config.FRESHA_BLOCKED_HOSTS))
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.resource_types or self.hosts)
+    
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.resource_types:
+            return True
+        host = (urlsplit(url).hostname or '').lower()
+        return any(host == blocked or host.endswith('.' + blocked) for blocked in self.hosts)
+    
+    def handle(self, route):
+        """Playwright route handler"""
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked += 1
+            route.abort()
+        else:
+            route.continue_()
+    
+    async def handle_async(self, route):
+        """Playwright route handler for the async API"""
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
@@ -0,0 +1,115 @@
+import time
+from threading import Condition
+from typing import Callable, Optional
+from src.utils.logger import logger
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+    
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f'{name} circuit is open, next trial call in {retry_after:.0f}s')
+
+# Called as listener(breaker, error) whenever a breaker trips from closed to open
+_open_listeners = []
+
+def on_circuit_open(listener: Callable[['CircuitBreaker', Exception], None]):
+    _open_listeners.append(listener)
+
+class CircuitBreaker:
+    """Fails calls fast while a dependency is down.
+    
+    Closed: calls go through; failure_threshold consecutive failures open the
+    circuit. Open: calls raise CircuitOpenError until reset_timeout seconds
+    have passed. Half-open: a single trial call goes through while other
+    callers wait for its outcome; success closes the circuit, failure opens
+    it for another reset_timeout.
+    
+    is_failure decides which exceptions count against the dependency (by
+    default all of them); other exceptions pass through and leave the state
+    unchanged.
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60,
+                 is_failure: Optional[Callable[[Exception], bool]] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda error: True)
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self.lock = Condition()
+    
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self.lock:
+            while self.state == HALF_OPEN and self._trial_running:
+                self.lock.wait()
+            if self.state == CLOSED:
+                return
+            retry_after = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == OPEN and retry_after <= 0:
+                self.state = HALF_OPEN
+                logger.info(f'{self.name} circuit half-open, sending a trial call')
+            if self.state == HALF_OPEN:
+                self._trial_running = True
+                return
+            raise CircuitOpenError(self.name, max(retry_after, 0))
+    
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info(f'{self.name} circuit closed, dependency recovered')
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+            self.lock.notify_all()
+    
+    def record_failure(self, error: Exception):
+        with self.lock:
+            self._trial_running = False
+            self.lock.notify_all()
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                tripped = False
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                tripped = True
+            else:
+                return
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+        
+        logger.error(f'{self.name} circuit open after {self.failures} failures, '
+                     f'failing fast for {self.reset_timeout:.0f}s: {error}')
+        if tripped:
+            for listener in _open_listeners:
+                try:
+                    listener(self, error)
+                except Exception as listener_error:
+                    logger.error(f'Circuit open listener failed: {listener_error}')
+    
+    def record_ignored(self):
+        """End a call whose error does not count against the dependency"""
+        with self.lock:
+            self._trial_running = False
+            self.lock.notify_all()
+    
+    def call(self, func: Callable, *args, **kwargs):
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            if self.is_failure(error):
+                self.record_failure(error)
+            else:
+                self.record_ignored()
+            raise
+        self.record_success()
+        return result
@@ -8,6 +8,54 @@ load_dotenv(dotenv_path=env_path)
 class Config:
     FRESHA_EMAIL = os.getenv('FRESHA_EMAIL', '')
     FRESHA_PASSWORD = os.getenv('FRESHA_PASSWORD', '')
+    # Live login cookies: kept in the user's state directory, outside the repo and its db/ mount
+    FRESHA_SESSION_PATH = Path(os.getenv('FRESHA_SESSION_PATH', str(
+        Path(os.getenv('XDG_STATE_HOME', str(Path.home() / '.local' / 'state'))) / 'fresha-automation' / 'fresha_session.json'
+    )))
+    FRESHA_BASE_URL = os.getenv('FRESHA_BASE_URL', 'https://www.fresha.com').rstrip('/')
+    # 'api': read the appointment JSON the Fresha web app fetches, falling back to
+    # the page text if none arrives; 'dom': always read the page text
+    FRESHA_SCRAPE_MODE = os.getenv('FRESHA_SCRAPE_MODE', 'api')
+    FRESHA_API_URL_PATTERN = os.getenv('FRESHA_API_URL_PATTERN', r'(?i)/(api|graphql)\b.*(appointment|booking|calendar)')
+    FRESHA_API_TIMEOUT_MS = int(os.getenv('FRESHA_API_TIMEOUT_MS', '15000'))
+    # Appointments page for one local day ({base_url}, {date} as YYYY-MM-DD), and how
+    # further pages of a day are reached: a next-page control, else infinite scroll
+    FRESHA_DAY_URL = os.getenv('FRESHA_DAY_URL', '{base_url}/appointments?date={date}')
+    FRESHA_NEXT_PAGE_SELECTOR = os.getenv(
+        'FRESHA_NEXT_PAGE_SELECTOR', 'a[rel="next"], button[aria-label="Next page"], button:has-text("Load more")'
+    )
+    FRESHA_PAGE_TIMEOUT_MS = int(os.getenv('FRESHA_PAGE_TIMEOUT_MS', '3000'))
+    FRESHA_MAX_PAGES = int(os.getenv('FRESHA_MAX_PAGES', '200'))
+    # Appointments page for one location and day, for `cli scrape-parallel`
+    # ({location} is an entry of the comma-separated FRESHA_LOCATIONS)
+    FRESHA_LOCATION_DAY_URL = os.getenv('FRESHA_LOCATION_DAY_URL', '{base_url}/appointments?date={date}&location={location}')
+    FRESHA_LOCATIONS = os.getenv('FRESHA_LOCATIONS', '')
+    # Pages scrape-parallel reads at once, and the least time between page loads
+    # or next-page requests any of them sends to one host
+    FRESHA_SCRAPE_CONCURRENCY = int(os.getenv('FRESHA_SCRAPE_CONCURRENCY', '4'))
+    FRESHA_REQUEST_INTERVAL_SECONDS = float(os.getenv('FRESHA_REQUEST_INTERVAL_SECONDS', '1'))
+    # Connect to a running `cli browser-daemon` (e.g. http://127.0.0.1:9222) instead of
+    # launching Chromium for every scrape
+    FRESHA_BROWSER_URL = os.getenv('FRESHA_BROWSER_URL', '')
+    FRESHA_BROWSER_PORT = int(os.getenv('FRESHA_BROWSER_PORT', '9222'))
+    FRESHA_BROWSER_MEMORY_LIMIT_MB = int(os.getenv('FRESHA_BROWSER_MEMORY_LIMIT_MB', '1024'))
+    FRESHA_BROWSER_CHECK_SECONDS = float(os.getenv('FRESHA_BROWSER_CHECK_SECONDS', '30'))
+    # Requests the scraper's browser aborts: Playwright resource types, and hosts
+    # (with their subdomains); set both empty to load everything
+    FRESHA_BLOCKED_RESOURCE_TYPES = os.getenv('FRESHA_BLOCKED_RESOURCE_TYPES', 'image,media,font')
+    FRESHA_BLOCKED_HOSTS = os.getenv('FRESHA_BLOCKED_HOSTS', ','.join([
+        'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'facebook.net',
+        'connect.facebook.com', 'hotjar.com', 'segment.io', 'segment.com', 'intercom.io',
+        'sentry.io', 'nr-data.net', 'fullstory.com', 'mixpanel.com', 'amplitude.com',
+    ]))
+    FRESHA_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('FRESHA_CIRCUIT_FAILURE_THRESHOLD', '3'))
+    FRESHA_CIRCUIT_RESET_TIMEOUT = float(os.getenv('FRESHA_CIRCUIT_RESET_TIMEOUT', '300'))
+    # The sync polls every FRESHA_SYNC_MIN_MINUTES while bookings are changing and
+    # backs off when they are not, up to the business-hours or off-hours ceiling
+    FRESHA_SYNC_MIN_MINUTES = int(os.getenv('FRESHA_SYNC_MIN_MINUTES', '5'))
+    FRESHA_SYNC_BUSINESS_MAX_MINUTES = int(os.getenv('FRESHA_SYNC_BUSINESS_MAX_MINUTES', '15'))
+    FRESHA_SYNC_MAX_MINUTES = int(os.getenv('FRESHA_SYNC_MAX_MINUTES', '60'))
+    FRESHA_BUSINESS_HOURS = os.getenv('FRESHA_BUSINESS_HOURS', '9-20')
     
     SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
     SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
@@ -15,10 +63,50 @@ class Config:
     SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
     SMTP_FROM_NAME = os.getenv('SMTP_FROM_NAME', 'Nail Salon')
     SMTP_FROM_EMAIL = os.getenv('SMTP_FROM_EMAIL', '')
+    SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '3'))
+    SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', '100'))
+    SMTP_IDLE_TIMEOUT = int(os.getenv('SMTP_IDLE_TIMEOUT', '60'))
+    SMTP_RATE_LIMIT_PER_MINUTE = int(os.getenv('SMTP_RATE_LIMIT_PER_MINUTE', '60'))
+    SMTP_RATE_LIMIT_PER_DAY = int(os.getenv('SMTP_RATE_LIMIT_PER_DAY', '2000'))
+    SMTP_DOMAIN_RATE_LIMIT_PER_MINUTE = int(os.getenv('SMTP_DOMAIN_RATE_LIMIT_PER_MINUTE', '30'))
+    SMTP_RATE_LIMIT_MAX_WAIT = float(os.getenv('SMTP_RATE_LIMIT_MAX_WAIT', '60'))
+    SMTP_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('SMTP_CIRCUIT_FAILURE_THRESHOLD', '5'))
+    SMTP_CIRCUIT_RESET_TIMEOUT = float(os.getenv('SMTP_CIRCUIT_RESET_TIMEOUT', '60'))
+    EMAIL_SEND_WORKERS = int(os.getenv('EMAIL_SEND_WORKERS', '3'))
+    EMAIL_SEND_PROCESSES = int(os.getenv('EMAIL_SEND_PROCESSES', '2'))
+    EMAIL_LOG_BUFFER_SIZE = int(os.getenv('EMAIL_LOG_BUFFER_SIZE', '50'))
+    EMAIL_LOG_FLUSH_INTERVAL = float(os.getenv('EMAIL_LOG_FLUSH_INTERVAL', '5'))
+    EMAIL_RETRY_MAX_ATTEMPTS = int(os.getenv('EMAIL_RETRY_MAX_ATTEMPTS', '5'))
+    EMAIL_RETRY_BASE_DELAY = float(os.getenv('EMAIL_RETRY_BASE_DELAY', '60'))
+    EMAIL_RETRY_MAX_DELAY = float(os.getenv('EMAIL_RETRY_MAX_DELAY', '3600'))
+    EMAIL_OUTBOX_INTERVAL_MINUTES = int(os.getenv('EMAIL_OUTBOX_INTERVAL_MINUTES', '5'))
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50'))
+    EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_LEASE_SECONDS', '300'))
+    
+    # 'event': each thank-you goes out THANK_YOU_DELAY_MINUTES after its appointment
+    # starts; 'fixed': sweeps at 12pm and 7pm
+    THANK_YOU_SCHEDULE = os.getenv('THANK_YOU_SCHEDULE', 'event')
+    THANK_YOU_DELAY_MINUTES = int(os.getenv('THANK_YOU_DELAY_MINUTES', '120'))
+    THANK_YOU_REFRESH_MINUTES = int(os.getenv('THANK_YOU_REFRESH_MINUTES', '10'))
+    # How far past its due time an appointment is still picked up, e.g. after downtime
+    THANK_YOU_LOOKBACK_HOURS = int(os.getenv('THANK_YOU_LOOKBACK_HOURS', '24'))
+    
+    SCHEDULER_THREADS = int(os.getenv('SCHEDULER_THREADS', '4'))
+    SCHEDULER_PROCESSES = int(os.getenv('SCHEDULER_PROCESSES', '1'))
+    SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.getenv('SCHEDULER_MISFIRE_GRACE_SECONDS', '300'))
+    SCHEDULER_JOB_LOCK_SECONDS = int(os.getenv('SCHEDULER_JOB_LOCK_SECONDS', '3600'))
+    # Missed daily windows re-run after downtime: at most this many per job, spaced out
+    SCHEDULER_MAX_CATCH_UP = int(os.getenv('SCHEDULER_MAX_CATCH_UP', '3'))
+    SCHEDULER_CATCH_UP_SPACING_SECONDS = int(os.getenv('SCHEDULER_CATCH_UP_SPACING_SECONDS', '60'))
+    
+    EMAIL_TEMPLATE_DIR = os.getenv('EMAIL_TEMPLATE_DIR', str(Path(__file__).parent.parent.parent / 'config' / 'templates'))
     
     ALERT_EMAIL = os.getenv('ALERT_EMAIL', '')
     TIMEZONE = os.getenv('TIMEZONE', 'America/New_York')
     
     DB_PATH = Path(__file__).parent.parent.parent / 'db' / 'fresha.db'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '10000'))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '16384'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024)))
 
 config = Config()
@@ -0,0 +1,84 @@
+from datetime import datetime, date, timedelta
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+from src.utils.config import config
+
+# Formats seen in scraped appointment dates, besides ISO 8601
+_DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%Y %H:%M', '%m/%d/%Y %I:%M %p')
+# Of those, the ones that give a day but no time of day
+_DAY_ONLY_FORMATS = ('%Y-%m-%d', '%m/%d/%Y')
+
+def salon_timezone() -> ZoneInfo:
+    return ZoneInfo(config.TIMEZONE)
+
+def parse_appointment_datetime(value: str) -> Optional[datetime]:
+    """Parse a stored or scraped appointment date into an aware datetime.
+    
+    Naive values are interpreted in the salon's timezone. Returns None when
+    the value is not a recognised date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    
+    parsed = None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        for fmt in _DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+    if parsed is None:
+        return None
+    
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=salon_timezone())
+    return parsed
+
+def has_start_time(value: str) -> bool:
+    """Whether an appointment date string gives a time of day, not just the day"""
+    if not value:
+        return False
+    for fmt in _DAY_ONLY_FORMATS:
+        try:
+            datetime.strptime(value.strip(), fmt)
+            return False
+        except ValueError:
+            continue
+    return parse_appointment_datetime(value) is not None
+
+def to_epoch(value: str) -> Optional[int]:
+    """UTC epoch seconds for an appointment date string, or None if unparseable"""
+    parsed = parse_appointment_datetime(value)
+    return int(parsed.timestamp()) if parsed else None
+
+def local_date(days_ago: int = 0) -> str:
+    """The salon's calendar date, optionally offset into the past, as YYYY-MM-DD"""
+    return (datetime.now(salon_timezone()).date() - timedelta(days=days_ago)).isoformat()
+
+def days_before(day: str, days: int) -> str:
+    """The date `days` days before `day`, as YYYY-MM-DD"""
+    return (date.fromisoformat(day[:10]) - timedelta(days=days)).isoformat()
+
+def day_bounds(day: str, days: int = 1) -> Tuple[int, int]:
+    """Half-open [start, end) UTC epoch range covering `days` local days from `day`"""
+    start_date = date.fromisoformat(day[:10])
+    tz = salon_timezone()
+    start = datetime.combine(start_date, datetime.min.time(), tzinfo=tz)
+    end = datetime.combine(start_date + timedelta(days=days), datetime.min.time(), tzinfo=tz)
+    return int(start.timestamp()), int(end.timestamp())
+
+def business_hours() -> Tuple[int, int]:
+    """FRESHA_BUSINESS_HOURS as (opening hour, closing hour), 24-hour local time"""
+    start, end = config.FRESHA_BUSINESS_HOURS.split('-')
+    return int(start), int(end)
+
+def closing_time(epoch: int) -> int:
+    """UTC epoch seconds of closing time on the local day containing `epoch`"""
+    tz = salon_timezone()
+    day = datetime.fromtimestamp(epoch, tz).date()
+    closing = datetime.combine(day, datetime.min.time(), tzinfo=tz) + timedelta(hours=business_hours()[1])
+    return int(closing.timestamp())
@@ -1,7 +1,9 @@
 import shutil
+import sqlite3
 from pathlib import Path
 from datetime import datetime
 from src.utils.config import config
+from src.database.db import get_connection, close_connections
 from src.utils.logger import logger
 
 def backup_database(backup_dir: Path = None) -> Path:
@@ -16,7 +18,12 @@ def backup_database(backup_dir: Path = None) -> Path:
     
     try:
         if config.DB_PATH.exists():
-            shutil.copy2(config.DB_PATH, backup_path)
+            # Online backup so pages still in the WAL file are included
+            target = sqlite3.connect(str(backup_path))
+            try:
+                get_connection().backup(target)
+            finally:
+                target.close()
             logger.info(f'Database backed up to {backup_path}')
             
             # Keep only last 10 backups
@@ -39,12 +46,20 @@ def restore_database(backup_path: Path) -> bool:
             logger.error(f'Backup file not found: {backup_path}')
             return False
         
+        # Closing our connections checkpoints the WAL into the main file
+        close_connections()
+        
         # Create backup of current database before restore
         if config.DB_PATH.exists():
             current_backup = config.DB_PATH.parent / f'fresha_pre_restore_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db'
             shutil.copy2(config.DB_PATH, current_backup)
             logger.info(f'Current database backed up to {current_backup}')
         
+        for suffix in ('-wal', '-shm'):
+            sidecar = config.DB_PATH.with_name(config.DB_PATH.name + suffix)
+            if sidecar.exists():
+                sidecar.unlink()
+        
         shutil.copy2(backup_path, config.DB_PATH)
         logger.info(f'Database restored from {backup_path}')
         return True
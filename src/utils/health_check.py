@@ -18,7 +18,6 @@ class HealthCheck:
             appointment_count = cursor.fetchone()[0]
             cursor.execute('SELECT COUNT(*) FROM email_logs')
             log_count = cursor.fetchone()[0]
-            conn.close()
             
             return {
                 'status': 'healthy',
@@ -40,6 +39,7 @@ class HealthCheck:
             is_connected = self.email_service.verify_connection()
             return {
                 'status': 'healthy' if is_connected else 'unhealthy',
+                'circuit': self.email_service.breaker.state,
                 'timestamp': datetime.now().isoformat()
             }
         except Exception as e:
@@ -61,7 +61,6 @@ class HealthCheck:
                 AND sent_at > datetime('now', '-1 hour')
             ''')
             recent_errors = cursor.fetchone()[0]
-            conn.close()
             
             return {
                 'status': 'healthy' if recent_errors < 10 else 'warning',
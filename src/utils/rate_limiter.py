@@ -1,41 +1,120 @@
 import time
-from collections import defaultdict
 from threading import Lock
 from src.utils.logger import logger
 
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to wait longer than allowed for capacity"""
+    
+    def __init__(self, keys, wait_time: float):
+        self.keys = keys
+        self.wait_time = wait_time
+        super().__init__(f'Rate limit reached for {", ".join(keys)}, next slot in {wait_time:.1f}s')
+
+class TokenBucket:
+    """Bucket holding up to `capacity` tokens, refilled continuously over `period` seconds"""
+    
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+    
+    def __init__(self, capacity: int, period: float):
+        self.capacity = float(capacity)
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+    
+    def wait_time(self, now: float, tokens: float = 1) -> float:
+        """Seconds until `tokens` are available (0 if they are now)"""
+        self._refill(now)
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+    
+    def consume(self, tokens: float = 1):
+        self.tokens -= tokens
+
 class RateLimiter:
-    """Simple rate limiter to prevent too many requests"""
+    """Token-bucket rate limiter with one bucket per key.
+    
+    Every operation is O(1) per key. Keys get the limit of the longest
+    registered prefix (see add_limit), falling back to max_calls per period.
+    """
     
     def __init__(self, max_calls: int = 10, period: int = 60):
         self.max_calls = max_calls
         self.period = period
-        self.calls = defaultdict(list)
+        self.limits = {}
+        self.buckets = {}
         self.lock = Lock()
     
+    def add_limit(self, prefix: str, max_calls: int, period: float):
+        """Limit keys equal to or starting with prefix to max_calls per period"""
+        with self.lock:
+            self.limits[prefix] = (max_calls, period)
+            for key in [key for key in self.buckets if key.startswith(prefix)]:
+                del self.buckets[key]
+    
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            matches = [prefix for prefix in self.limits if key.startswith(prefix)]
+            max_calls, period = self.limits[max(matches, key=len)] if matches else (self.max_calls, self.period)
+            bucket = self.buckets[key] = TokenBucket(max_calls, period)
+        return bucket
+    
+    def try_acquire(self, *keys: str) -> float:
+        """Take one token from every key's bucket if all have one.
+        
+        Returns 0 on success. Otherwise nothing is consumed and the number of
+        seconds until all buckets can serve the call is returned.
+        """
+        keys = keys or ('default',)
+        with self.lock:
+            now = time.monotonic()
+            buckets = [self._bucket(key) for key in keys]
+            wait_time = max(bucket.wait_time(now) for bucket in buckets)
+            if wait_time == 0:
+                for bucket in buckets:
+                    bucket.consume()
+            return wait_time
+    
+    def next_available_at(self, *keys: str) -> float:
+        """Epoch time at which a call for all keys would be allowed, without consuming"""
+        keys = keys or ('default',)
+        with self.lock:
+            now = time.monotonic()
+            wait_time = max(self._bucket(key).wait_time(now) for key in keys)
+        return time.time() + wait_time
+    
+    def acquire(self, *keys: str, max_wait: float = None):
+        """Block until a token is taken for every key.
+        
+        Raises RateLimitExceeded instead of sleeping when the wait would be
+        longer than max_wait seconds.
+        """
+        while True:
+            wait_time = self.try_acquire(*keys)
+            if wait_time == 0:
+                return
+            if max_wait is not None and wait_time > max_wait:
+                raise RateLimitExceeded(keys or ('default',), wait_time)
+            logger.debug(f'Rate limit reached, waiting {wait_time:.2f}s')
+            time.sleep(wait_time)
+    
     def is_allowed(self, key: str = 'default') -> bool:
         """Check if a call is allowed"""
-        with self.lock:
-            now = time.time()
-            # Remove old calls outside the period
-            self.calls[key] = [
-                call_time for call_time in self.calls[key]
-                if now - call_time < self.period
-            ]
-            
-            if len(self.calls[key]) >= self.max_calls:
-                logger.warning(f'Rate limit exceeded for {key}')
-                return False
-            
-            self.calls[key].append(now)
+        if self.try_acquire(key) == 0:
             return True
+        logger.warning(f'Rate limit exceeded for {key}')
+        return False
     
     def wait_if_needed(self, key: str = 'default'):
         """Wait if rate limit is exceeded"""
-        if not self.is_allowed(key):
-            oldest_call = min(self.calls[key])
-            wait_time = self.period - (time.time() - oldest_call) + 1
-            if wait_time > 0:
-                logger.info(f'Rate limit reached, waiting {wait_time:.1f}s')
-                time.sleep(wait_time)
-                return self.is_allowed(key)
+        wait_time = self.try_acquire(key)
+        if wait_time > 0:
+            logger.info(f'Rate limit reached, waiting {wait_time:.1f}s')
+            self.acquire(key)
         return True
@@ -1,4 +1,5 @@
 import logging
+import random
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -7,6 +8,8 @@ from tenacity import (
     before_sleep_log
 )
 from src.utils.logger import logger
+from src.utils.rate_limiter import RateLimitExceeded
+from src.utils.circuit_breaker import CircuitOpenError
 import smtplib
 
 @retry(
@@ -30,3 +33,17 @@ def retry_email_operation(func, *args, **kwargs):
 def retry_scraper_operation(func, *args, **kwargs):
     """Retry decorator for scraper operations"""
     return func(*args, **kwargs)
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with jitter: a random delay in [d/2, d] where d = base * 2^(attempt-1), capped"""
+    delay = min(cap, base * 2 ** max(attempt - 1, 0))
+    return random.uniform(delay / 2, delay)
+
+def is_transient_email_error(error: Exception) -> bool:
+    """Whether a failed send is worth retrying later"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # Retry only if every recipient got a temporary (4xx) refusal
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPException, OSError, RateLimitExceeded, CircuitOpenError))